@@ -1,43 +1,505 @@
+import atexit
+import copy
+import hashlib
+import json
 import requests
 import logging
+import os
+import tempfile
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Use the faster orjson decoder when it is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Use the incremental JSON parser for streamed responses if installed
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Cache idempotent GET responses between invocations if requests-cache is installed
+try:
+    import requests_cache
+except ImportError:
+    requests_cache = None
+
+# Errors that command handlers report to the user; anything else is a bug and propagates to main()
+EXPECTED_ERRORS = (requests.exceptions.RequestException, KeyError, ValueError)
+
+# Default timeout (seconds) applied to every request
+DEFAULT_TIMEOUT = 30
+
+# Identifies the CLI to the API, e.g. in server logs, instead of the generic python-requests agent
+USER_AGENT = 'mmaictl/1.0.0'
+
+# Keep-alive connections kept open per host; at least utils.MAX_FETCH_WORKERS so a
+# concurrent per-cluster fan-out reuses its connections instead of discarding them
+POOL_MAXSIZE = 32
+
+# Location and lifetime (seconds) of the HTTP response cache. The directory is created
+# private to the user (0700), since the cached responses come from authenticated requests.
+CACHE_DIR = os.path.expanduser('~/.cache/mmaictl')
+CACHE_NAME = os.path.join(CACHE_DIR, 'http_cache')
+CACHE_EXPIRE_AFTER = 30
+
+# Shorter lifetimes (seconds) for endpoints whose data changes often; other URLs use CACHE_EXPIRE_AFTER
+CACHE_EXPIRE_AFTER_URLS = {
+    '*/workloads': 10,
+    '*/nodes': 10,
+}
+
+# Lifetime (seconds) of the cached cluster list, in memory and on disk
+CLUSTERS_CACHE_TTL = 30
+
+# How long (seconds) the detected support for batch GETs is remembered on disk, per API URL
+BATCH_SUPPORT_TTL = 24 * 3600
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter allowing at most `max_calls` requests per `period` seconds.
+    The bucket can also be paused when the API signals that the rate limit is exhausted.
+    """
+    def __init__(self, max_calls, period=1.0):
+        self.capacity = float(max_calls)
+        self.tokens = float(max_calls)
+        self.rate = max_calls / period
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request may be sent."""
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    time.sleep(self.paused_until - now)
+                    continue
+
+                # Refill the bucket based on the time elapsed since the last call
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                time.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Stops handing out tokens for the given number of seconds."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+def write_cache_file(path, data):
+    """
+    Writes `data` as JSON to `path` in CACHE_DIR, atomically. The data goes to a temporary
+    file of its own first, so concurrent invocations never write to the same file and readers
+    only ever see a complete one. Raises OSError on failure.
+    """
+    os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+    tmp = tempfile.NamedTemporaryFile('w', dir=CACHE_DIR, suffix='.tmp', delete=False)
+    try:
+        with tmp:
+            json.dump(data, tmp)
+        os.replace(tmp.name, path)
+    except BaseException:
+        try:
+            os.remove(tmp.name)
+        except OSError:
+            pass
+        raise
 
 class APIClient:
-    def __init__(self, base_url, token=None):
+    def __init__(self, base_url, token=None, timeout=DEFAULT_TIMEOUT, rate_limit=None, cache=True):
         self.base_url = base_url.rstrip('/')
         self.headers = {'Authorization': f'Bearer {token}'} if token else {}
+        self.timeout = timeout
+        self._limiter = RateLimiter(rate_limit) if rate_limit else None
+        self._cache = cache
+        self._clusters = None
+        self._clusters_fetched_at = 0.0
+        self._cluster_index = None
+        self._supports_batch = None
+        self._templates = {}
+        self._send_settings = None
+
+        # Reuse a single session so connections are pooled and kept alive between calls
+        if cache and requests_cache is not None:
+            os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+            self.session = requests_cache.CachedSession(
+                # requests-cache leaves the Authorization header out of its cache keys, so each API
+                # URL and token gets a cache of its own; a response fetched with one credential is
+                # never served to another
+                cache_name=f"{CACHE_NAME}-{self._cache_key()}",
+                backend='sqlite',
+                expire_after=CACHE_EXPIRE_AFTER,
+                urls_expire_after=CACHE_EXPIRE_AFTER_URLS,
+                allowable_methods=('GET',),
+                cache_control=True,
+                stale_if_error=True,
+            )
+        else:
+            self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.headers['User-Agent'] = USER_AGENT
+        self.session.headers['Accept'] = 'application/json'
+        # Retry transient failures with exponential backoff, honoring Retry-After on 429/503
+        retries = Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                        respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=POOL_MAXSIZE, max_retries=retries)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.hooks['response'].append(self._check_rate_limit)
+
+    def close(self):
+        """Closes the pooled connections held by the session."""
+        self.session.close()
+
+    def _check_rate_limit(self, response, *args, **kwargs):
+        """Response hook that pauses the rate limiter when the API reports no remaining quota."""
+        if self._limiter is None:
+            return
+        if response.headers.get('X-RateLimit-Remaining') != '0' and response.status_code != 429:
+            return
+        retry_after = response.headers.get('Retry-After', '1')
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            delay = 1.0
+        logging.info(f"API rate limit reached, pausing requests for {delay} seconds")
+        self._limiter.pause(delay)
+
+    def _decode(self, response):
+        """Decodes a JSON response body."""
+        if orjson is not None:
+            return orjson.loads(response.content)
+        return response.json()
+
+    def _prepare(self, method, endpoint, params=None, data=None):
+        """
+        Builds the request from a per-method PreparedRequest template, so session headers,
+        auth and hooks are merged once per method rather than on every call. Cookies are
+        added per request, since the session's cookie jar can change between calls.
+        """
+        template = self._templates.get(method)
+        if template is None:
+            template = self.session.prepare_request(requests.Request(method, self.base_url))
+            template.headers.pop('Cookie', None)
+            self._templates[method] = template
+
+        prepared = template.copy()
+        prepared.prepare_url(f"{self.base_url}/{endpoint}", params)
+        prepared.prepare_cookies(self.session.cookies)
+        if data is not None:
+            prepared.prepare_body(None, None, json=data)
+        return prepared
+
+    def _send(self, method, endpoint, params=None, data=None, stream=False):
+        """Sends a request through the session using the prepared template for `method`."""
+        if self._send_settings is None:
+            # Proxy and TLS settings from the environment, resolved once instead of per request
+            self._send_settings = self.session.merge_environment_settings(self.base_url, {}, None, None, None)
+            self._send_settings.pop('stream', None)
+        prepared = self._prepare(method, endpoint, params=params, data=data)
+        return self.session.send(prepared, timeout=self.timeout, stream=stream, **self._send_settings)
+
+    def _throttle(self):
+        """Waits for the rate limiter, if one is configured."""
+        if self._limiter is not None:
+            self._limiter.acquire()
 
     def get(self, endpoint, params=None):
+        self._throttle()
         try:
-            response = requests.get(f"{self.base_url}/{endpoint}", headers=self.headers, params=params)
+            response = self._send('GET', endpoint, params=params)
             response.raise_for_status()
-            return response.json()
+            return self._decode(response)
         except requests.exceptions.RequestException as e:
             logging.error(f"GET request failed: {str(e)}")
             raise e
 
+    def sub(self, prefix):
+        """
+        Returns a client whose base URL includes `prefix`, sharing this client's session,
+        rate limiter and settings. Calls then only need the endpoint below the prefix.
+        """
+        sub_client = copy.copy(self)
+        sub_client.base_url = f"{self.base_url}/{prefix.strip('/')}"
+        return sub_client
+
+    def get_clusters(self):
+        """
+        Returns the list of clusters, re-fetching it from the API at most every CLUSTERS_CACHE_TTL seconds.
+        Unless caching is disabled, the list is also shared between invocations through a file in CACHE_DIR,
+        and an expired copy of that file is used if the API cannot be reached.
+        Call invalidate_clusters() after any change to the set of clusters.
+        """
+        now = time.monotonic()
+        if self._clusters is not None and now - self._clusters_fetched_at < CLUSTERS_CACHE_TTL:
+            return self._clusters
+
+        clusters = self._read_clusters_cache() if self._cache else None
+        if clusters is None:
+            try:
+                clusters = self.get("clusters")
+            except requests.exceptions.RequestException:
+                clusters = self._read_clusters_cache(max_age=None) if self._cache else None
+                if clusters is None:
+                    raise
+                logging.warning("Using the cached cluster list; the API could not be reached")
+            else:
+                if self._cache:
+                    self._write_clusters_cache(clusters)
+
+        self._clusters = clusters
+        self._clusters_fetched_at = now
+        self._cluster_index = None
+        return clusters
+
+    def get_cluster(self, identifier):
+        """
+        Returns the cluster with the given name or UID from the cached cluster list, or None if there is none.
+        The name/UID index is built once per fetched cluster list; when identifiers collide,
+        the first cluster in the list wins, as with a linear scan.
+        """
+        clusters = self.get_clusters()
+        if self._cluster_index is None:
+            index = {}
+            for cluster in clusters or []:
+                index.setdefault(cluster['name'], cluster)
+                index.setdefault(cluster['uid'], cluster)
+            self._cluster_index = index
+        return self._cluster_index.get(identifier)
+
+    def invalidate_clusters(self):
+        """Drops the cached cluster list so the next lookup re-fetches it."""
+        self._clusters = None
+        self._cluster_index = None
+        try:
+            os.remove(self._clusters_cache_file())
+        except OSError:
+            pass
+
+    def _cache_key(self):
+        """Returns a short hash of the API URL and token, used to name the cache files."""
+        return hashlib.sha256(f"{self.base_url} {self.headers.get('Authorization', '')}".encode()).hexdigest()[:16]
+
+    def _clusters_cache_file(self):
+        """Returns the cluster cache file for this API URL and token."""
+        return os.path.join(CACHE_DIR, f"clusters-{self._cache_key()}.json")
+
+    def _read_clusters_cache(self, max_age=CLUSTERS_CACHE_TTL):
+        """Returns the cluster list cached on disk, or None if it is missing or older than `max_age` (None: any age)."""
+        path = self._clusters_cache_file()
+        try:
+            if max_age is not None and time.time() - os.path.getmtime(path) >= max_age:
+                return None
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_clusters_cache(self, clusters):
+        """Saves the cluster list to disk; failures only disable the cache."""
+        path = self._clusters_cache_file()
+        try:
+            write_cache_file(path, clusters)
+        except OSError as e:
+            logging.debug(f"Could not write cluster cache {path}: {e}")
+
+    def batch_get(self, endpoint, ids, id_param='cluster_uid', group_key='clusterUid', chunk=50):
+        """
+        Fetches `endpoint` for many IDs at once, e.g. GET departments?cluster_uid=a,b,c,
+        issuing one request per `chunk` IDs and grouping the returned items by `group_key`.
+
+        Support for the batch form is detected on first use and remembered per endpoint, on
+        disk for BATCH_SUPPORT_TTL so later invocations do not probe again: a 400/404 response,
+        or items that cannot be attributed to a requested ID, mark the endpoint as unsupported.
+        An empty reply proves nothing (the server may have ignored `id_param`), so until
+        support is known it is treated as unsupported without being remembered.
+
+        Returns:
+            dict or None: A mapping of ID -> list of items, or None if the server does not
+            support batching this endpoint and the caller should fetch each ID itself.
+        """
+        supported = self._batch_support().get(endpoint)
+        if supported is False:
+            return None
+
+        results = {uid: [] for uid in ids}
+        found = False
+        try:
+            for start in range(0, len(ids), chunk):
+                self._throttle()
+                response = self._send('GET', endpoint, params={id_param: ','.join(ids[start:start + chunk])})
+                if response.status_code in (400, 404):
+                    raise ValueError(f"HTTP {response.status_code}")
+                response.raise_for_status()
+
+                items = self._decode(response)
+                if not isinstance(items, list):
+                    raise ValueError("response is not a list")
+                for item in items:
+                    if not isinstance(item, dict) or item.get(group_key) not in results:
+                        raise ValueError(f"item without a requested '{group_key}'")
+                    results[item[group_key]].append(item)
+                    found = True
+        except ValueError as e:
+            logging.info(f"Batch GET of '{endpoint}' is not supported ({e}), fetching each ID separately")
+            self._remember_batch_support(endpoint, False)
+            return None
+        except requests.exceptions.RequestException as e:
+            logging.error(f"GET request failed: {str(e)}")
+            raise e
+
+        if not found and supported is None:
+            logging.info(f"Batch GET of '{endpoint}' returned nothing, fetching each ID separately")
+            return None
+
+        if supported is None:
+            self._remember_batch_support(endpoint, True)
+        return results
+
+    def _batch_support_file(self):
+        """Returns the file recording which endpoints accept batch GETs on this API URL."""
+        key = hashlib.sha256(self.base_url.encode()).hexdigest()[:16]
+        return os.path.join(CACHE_DIR, f"batch_support-{key}.json")
+
+    def _batch_support(self):
+        """Returns the endpoint -> batch support mapping, loaded from disk on first use."""
+        if self._supports_batch is None:
+            self._supports_batch = {}
+            path = self._batch_support_file()
+            try:
+                if time.time() - os.path.getmtime(path) < BATCH_SUPPORT_TTL:
+                    with open(path) as f:
+                        self._supports_batch = json.load(f)
+            except (OSError, ValueError):
+                pass
+        return self._supports_batch
+
+    def _remember_batch_support(self, endpoint, supported):
+        """Records whether `endpoint` accepts batch GETs; failures to save it are only logged."""
+        self._batch_support()[endpoint] = supported
+        path = self._batch_support_file()
+        try:
+            write_cache_file(path, self._supports_batch)
+        except OSError as e:
+            logging.debug(f"Could not write batch support cache {path}: {e}")
+
+    def invalidate_cache(self):
+        """Clears cached GET responses after a request that modifies server state."""
+        if requests_cache is not None and isinstance(self.session, requests_cache.CachedSession):
+            self.session.cache.clear()
+
+    def stream(self, endpoint, prefix='item', params=None, fields=None):
+        """
+        Yields the objects found under `prefix` in a JSON response one at a time.
+        With `ijson` installed the body is parsed incrementally as it arrives, so a large
+        array is never fully materialized; otherwise the whole response is decoded first.
+
+        `fields` lists the top-level keys the caller needs. They are sent as the `fields`
+        query parameter, and each object is trimmed to them as soon as it is parsed, so the
+        rest of a large object is dropped even if the server ignores the parameter.
+        """
+        if fields is None:
+            yield from self._stream(endpoint, prefix, params)
+            return
+
+        fields = tuple(fields)
+        params = dict(params or {}, fields=','.join(fields))
+        for obj in self._stream(endpoint, prefix, params):
+            yield {key: obj[key] for key in fields if key in obj} if isinstance(obj, dict) else obj
+
+    def _stream(self, endpoint, prefix, params):
+        """Yields the objects under `prefix` of a GET response, as described in stream()."""
+        self._throttle()
+        try:
+            response = self._send('GET', endpoint, params=params, stream=True)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logging.error(f"GET request failed: {str(e)}")
+            raise e
+
+        with response:
+            # A response served by requests-cache has no raw stream to read, but its body is
+            # already in memory, so it is simply decoded
+            if ijson is not None and not getattr(response, 'from_cache', False):
+                # Let urllib3 undo any Content-Encoding before the parser sees the bytes.
+                # use_float keeps numbers as floats rather than Decimal, matching response.json().
+                response.raw.decode_content = True
+                try:
+                    yield from ijson.items(response.raw, prefix, use_float=True)
+                except ijson.JSONError as e:
+                    # Reported like the ValueError raised when a whole response fails to decode
+                    raise ValueError(f"Invalid JSON response from {endpoint}: {e}") from e
+                return
+
+            data = self._decode(response)
+            if prefix == 'item' and isinstance(data, list):
+                yield from data
+            else:
+                yield data
+
     def post(self, endpoint, data=None):
+        self._throttle()
         try:
-            response = requests.post(f"{self.base_url}/{endpoint}", headers=self.headers, json=data)
+            response = self._send('POST', endpoint, data=data)
             response.raise_for_status()
-            return response.json()
+            self.invalidate_cache()
+            return self._decode(response)
         except requests.exceptions.RequestException as e:
             logging.error(f"POST request failed: {str(e)}")
             raise e
 
     def put(self, endpoint, data=None):
+        self._throttle()
         try:
-            response = requests.put(f"{self.base_url}/{endpoint}", headers=self.headers, json=data)
+            response = self._send('PUT', endpoint, data=data)
             response.raise_for_status()
-            return response.json()
+            self.invalidate_cache()
+            return self._decode(response)
         except requests.exceptions.RequestException as e:
             logging.error(f"PUT request failed: {str(e)}")
             raise e
 
     def delete(self, endpoint):
+        self._throttle()
         try:
-            response = requests.delete(f"{self.base_url}/{endpoint}", headers=self.headers)
+            response = self._send('DELETE', endpoint)
             response.raise_for_status()
+            self.invalidate_cache()
             return response.status_code == 204
         except requests.exceptions.RequestException as e:
             logging.error(f"DELETE request failed: {str(e)}")
             raise e
+
+# Clients shared across commands, keyed by their connection settings
+_clients = {}
+
+def get_client(base_url, token=None, **kwargs):
+    """
+    Returns the shared APIClient for the given settings, creating it on first use.
+    Reusing the client keeps its connection pool and cached lookups alive between commands.
+    """
+    key = (base_url.rstrip('/'), token, tuple(sorted(kwargs.items())))
+    client = _clients.get(key)
+    if client is None:
+        client = APIClient(base_url, token=token, **kwargs)
+        _clients[key] = client
+    return client
+
+def close_clients():
+    """Closes every shared client."""
+    for client in _clients.values():
+        client.close()
+    _clients.clear()
+
+atexit.register(close_clients)
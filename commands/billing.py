@@ -1,6 +1,7 @@
-import json
 import logging
-from utils import flatten_json, get_cluster_uid, filter_json
+import sys
+from api_client import EXPECTED_ERRORS
+from utils import flattened_lines, get_cluster_uid, filter_json, print_json
 
 def setup_parser(subparsers):
     """Sets up the argparse subcommands for billing."""
@@ -22,27 +23,24 @@ def list_billing(args, client):
     """Lists billing details for all departments in a cluster."""
     try:
         cluster_uid = get_cluster_uid(client, args.cluster)
-        billing = client.get(f"billing/{cluster_uid}")
-
-        # Apply filter if provided
-        if args.filter:
-            filters = args.filter.split(',')
-            billing = filter_json(billing, filters)
+        filters = args.filter.split(',') if args.filter else None
 
         if args.output == 'json':
-            return json.dumps(billing, indent=4)
+            billing = client.get(f"billing/{cluster_uid}")
+
+            # Apply filter if provided
+            if filters:
+                billing = filter_json(billing, filters)
 
-        flattened_billing = []
-        for i, item in enumerate(billing):
-            flattened_item = flatten_json(item, parent_key=f'billing[{i}]')
-            flattened_billing.append(flattened_item)
+            print_json(billing)
+            return
 
-        output_lines = []
-        for flattened_item in flattened_billing:
-            for key, value in flattened_item.items():
-                output_lines.append(f"{key}: {value}")
+        # Stream the billing records and print each one as soon as it is parsed
+        billing = client.stream(f"billing/{cluster_uid}")
+        if filters:
+            billing = (filter_json(item, filters) for item in billing)
 
-        print("\n".join(output_lines))
+        sys.stdout.writelines(f"{line}\n" for line in flattened_lines(billing, 'billing'))
 
-    except Exception as e:
-        print(f"Error: {str(e)}")
\ No newline at end of file
+    except EXPECTED_ERRORS as e:
+        print(f"Error: {str(e)}")
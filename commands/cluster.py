@@ -1,7 +1,11 @@
-import json
 import logging
-import requests
-from utils import flatten_json, get_cluster_uid, filter_json
+import re
+import sys
+from api_client import EXPECTED_ERRORS
+from utils import iter_flat_lines, get_cluster_uid, print_json
+
+# Valid property names for `cluster set`
+PROPERTY_KEY_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
 
 def setup_parser(subparsers):
     """Sets up the argparse subcommands for clusters."""
@@ -47,36 +51,36 @@ def add_cluster(args, client):
         "description": args.description,
     }
     result = client.post("clusters", data)
+    client.invalidate_clusters()
     logging.info(f"Cluster '{args.name}' added successfully")
     return result
 
 def list_clusters(args, client):
     """Lists the names of all clusters."""
     try:
-        clusters = client.get("clusters")
-
+        # Served from the cluster cache when it is fresh
+        clusters = client.get_clusters()
         if args.output == 'json':
             # Output only the names as JSON
-            cluster_names = [cluster['name'] for cluster in clusters]
-            print(json.dumps(cluster_names, indent=4))
+            print_json([cluster['name'] for cluster in clusters])
             return
 
         # Default output: list of cluster names
-        cluster_names = [cluster['name'] for cluster in clusters]
-        print("\n".join(cluster_names))
+        sys.stdout.writelines(f"{cluster['name']}\n" for cluster in clusters)
 
-    except Exception as e:
+    except EXPECTED_ERRORS as e:
         logging.error(f"Error: {str(e)}")
         print(f"Error: {str(e)}")
 
 def get_clusters(args, client):
     """Gets one or more clusters' properties."""
     try:
-        clusters = client.get("clusters")
+        clusters = client.get_clusters()
 
         # If --name is provided, filter clusters by the given names
         if args.name:
-            clusters = [cluster for cluster in clusters if cluster['name'] in args.name]
+            wanted_names = set(args.name)
+            clusters = [cluster for cluster in clusters if cluster['name'] in wanted_names]
 
         if not clusters:
             print("No matching clusters found.")
@@ -84,24 +88,14 @@ def get_clusters(args, client):
 
         if args.output == 'json':
             # Output the filtered data as JSON
-            print(json.dumps(clusters, indent=4))
+            print_json(clusters)
             return
 
-        # Default output: Flattened dot notation for text format
-        flattened_clusters = []
+        # Default output: Flattened dot notation for text format, one cluster at a time
         for i, cluster in enumerate(clusters):
-            flattened_cluster = flatten_json(cluster, parent_key=f'cluster[{i}]')
-            flattened_clusters.append(flattened_cluster)
-
-        # Format the flattened clusters as key: value text
-        output_lines = []
-        for flattened_cluster in flattened_clusters:
-            for key, value in flattened_cluster.items():
-                output_lines.append(f"{key}: {value}")
-        
-        print("\n".join(output_lines))
-
-    except Exception as e:
+            sys.stdout.writelines(f"{line}\n" for line in iter_flat_lines(cluster, f"cluster[{i}]"))
+
+    except EXPECTED_ERRORS as e:
         logging.error(f"Error: {str(e)}")
         print(f"Error: {str(e)}")
 
@@ -114,6 +108,7 @@ def get_cluster(args, client):
 def delete_cluster(args, client):
     """Deletes a cluster by UID."""
     success = client.delete(f"clusters/{args.uid}")
+    client.invalidate_clusters()
     if success:
         logging.info(f"Cluster {args.uid} deleted successfully")
     return success
@@ -130,36 +125,24 @@ def set_cluster_property(args, client):
         # Get the cluster UID from the cluster name provided by the user
         cluster_uid = get_cluster_uid(client, args.cluster)
 
-        # Ensure that the API URL is available (from --api-url argument)
-        if not args.api_url:
-            raise ValueError("API URL is not provided. Use --api-url to specify the API endpoint.")
-
         # Prepare the data to be updated
         update_data = {}
         for prop in args.properties:
-            key, value = prop.split('=')
+            # partition() keeps any '=' that appears inside the value
+            key, sep, value = prop.partition('=')
+            if not sep or not PROPERTY_KEY_RE.match(key):
+                raise ValueError(f"Invalid property '{prop}'. Use the format property=value.")
             update_data[key] = value
 
         logging.info(f"Updating cluster '{args.cluster}' (UID: {cluster_uid}) with data: {update_data}")
 
-        # Construct the API URL
-        api_url = f"{args.api_url}/clusters/{cluster_uid}"
-
-        # Convert the update_data dictionary to a JSON string
-        update_data_json = json.dumps(update_data)
-
-        # Make the PUT request using the `requests` library
-        response = requests.put(api_url, data=update_data_json, headers={'Content-Type': 'application/json'})
+        # An error response raises and is reported below
+        result = client.put(f"clusters/{cluster_uid}", update_data)
+        client.invalidate_clusters()
 
-        # Handle successful response
-        if response.status_code == 200:
-            logging.info(f"Cluster '{args.cluster}' updated successfully.")
-            print(f"Cluster updated: {response.json()}")
-        else:
-            # Handle 400 (Not Found) or other errors
-            logging.error(f"Failed to update cluster: {response.text}")
-            print(f"Error: {response.text}")
+        logging.info(f"Cluster '{args.cluster}' updated successfully.")
+        print(f"Cluster updated: {result}")
 
-    except Exception as e:
+    except EXPECTED_ERRORS as e:
         logging.error(f"Failed to update cluster: {e}")
         print(f"Error: {str(e)}")
@@ -1,6 +1,9 @@
-import json
 import logging
-from utils import flatten_json, get_cluster_uid, filter_json
+import sys
+from api_client import EXPECTED_ERRORS
+from utils import flatten_json, flattened_lines, resolve_clusters, filter_json, fetch_per_cluster, print_json
+
+log = logging.getLogger(__name__)
 
 def setup_parser(subparsers):
     """Sets up the argparse subcommands for departments."""
@@ -41,33 +44,35 @@ def add_department(args, client):
         "description": args.description,
     }
     result = client.post("departments", data)
-    logging.info(f"Department '{args.name}' added successfully")
+    log.info("Department '%s' added successfully", args.name)
     return result
 
 def list_departments(args, client):
     """Lists all departments in a cluster or from all clusters if no cluster is specified."""
     try:
-        # If no cluster is specified, fetch all clusters
-        if not args.cluster:
-            clusters = client.get("clusters")
-            if not clusters or not isinstance(clusters, list):
-                logging.error("No clusters found.")
-                return None
-        else:
-            # Fetch only the specified cluster
-            cluster_uid = get_cluster_uid(client, args.cluster)
-            clusters = [{"name": args.cluster, "uid": cluster_uid}]
+        # The cluster named by --cluster, or all clusters
+        clusters = resolve_clusters(args, client)
+        if clusters is None:
+            return None
 
         all_departments = []
 
-        for cluster in clusters:
+        # Fetch departments for all clusters in one batch request if the API supports it,
+        # otherwise fetch each cluster's departments concurrently
+        departments_by_cluster = None
+        if len(clusters) > 1:
+            departments_by_cluster = client.batch_get("departments", [cluster.get('uid') for cluster in clusters])
+
+        if departments_by_cluster is not None:
+            results = [(cluster, departments_by_cluster[cluster.get('uid')]) for cluster in clusters]
+        else:
+            results = fetch_per_cluster(clusters, lambda uid: client.sub(f"clusters/{uid}").get("departments"))
+
+        for cluster, departments in results:
             cluster_name = cluster.get('name')
-            cluster_uid = cluster.get('uid')
 
-            # Fetch departments for this cluster
-            departments = client.get(f"clusters/{cluster_uid}/departments")
             if not departments:
-                logging.warning(f"No departments found for cluster {cluster_name}.")
+                log.warning("No departments found for cluster %s.", cluster_name)
                 continue
 
             # Apply filter if provided
@@ -75,6 +80,11 @@ def list_departments(args, client):
                 filters = args.filter.split(',')
                 departments = filter_json(departments, filters)
 
+            # Text output is written per cluster as soon as its departments are flattened
+            if args.output != 'json':
+                sys.stdout.writelines(f"{line}\n" for line in flattened_lines(departments, f"cluster[{cluster_name}].department"))
+                continue
+
             # Flatten each department and prefix with the cluster name
             for i, department in enumerate(departments):
                 flattened_department = flatten_json(department, parent_key=f"cluster[{cluster_name}].department[{i}]")
@@ -82,18 +92,10 @@ def list_departments(args, client):
 
         # If JSON output is requested
         if args.output == 'json':
-            return json.dumps(all_departments, indent=4)
-
-        # Prepare text output
-        output_lines = []
-        for department in all_departments:
-            for key, value in department.items():
-                output_lines.append(f"{key}: {value}")
-
-        print("\n".join(output_lines))
+            print_json(all_departments)
 
-    except Exception as e:
-        logging.error(f"Failed to fetch departments: {e}")
+    except EXPECTED_ERRORS as e:
+        log.error("Failed to fetch departments: %s", e)
         return None
 
 
@@ -109,18 +111,18 @@ def list_departments_by_cluster_uid(cluster_uid, client):
         list or str: A list of departments or an error message if the request fails.
     """
     try:
-        logging.info(f"Fetching departments for cluster UID: {cluster_uid}")
+        log.info("Fetching departments for cluster UID: %s", cluster_uid)
         departments = client.get(f"clusters/{cluster_uid}/departments")
 
         # Check if the response is a list (the expected type)
         if not isinstance(departments, list):
-            logging.error(f"Unexpected response type: {type(departments)}. Expected list.")
+            log.error("Unexpected response type: %s. Expected list.", type(departments))
             return None
 
         return departments
 
-    except Exception as e:
-        logging.error(f"Failed to fetch departments for cluster {cluster_uid}: {e}")
+    except EXPECTED_ERRORS as e:
+        log.error("Failed to fetch departments for cluster %s: %s", cluster_uid, e)
         return None
 
 def get_department(args, client):
@@ -132,5 +134,5 @@ def delete_department(args, client):
     """Deletes a department by name."""
     success = client.delete(f"departments/{args.name}")
     if success:
-        logging.info(f"Department {args.name} deleted successfully")
+        log.info("Department %s deleted successfully", args.name)
     return success
@@ -1,6 +1,9 @@
-import json
 import logging
-from utils import flatten_json, get_cluster_uid, filter_json
+import sys
+from api_client import EXPECTED_ERRORS
+from utils import add_action_parsers, flatten_many, resolve_clusters, filter_json, projection_params, fetch_per_cluster, iter_per_cluster, print_json, pretty_json
+
+log = logging.getLogger(__name__)
 
 def setup_parser(subparsers):
     """Sets up the argparse subcommands for node groups."""
@@ -11,28 +14,38 @@ def setup_parser(subparsers):
     )
     nodegroup_subparsers = nodegroup_parser.add_subparsers(dest='action', help='Action to perform')
 
-    # nodegroup add
-    add_parser = nodegroup_subparsers.add_parser('add', help='Add a new node group')
+    # Only the arguments of the requested action are built
+    add_action_parsers(nodegroup_subparsers, 'nodegroup', {
+        'add': ('Add a new node group', _build_add_parser),
+        'list': ('List all node groups in a cluster', _build_list_parser),
+        'get': ('Get all properties of one or more node groups', _build_get_parser),
+        'delete': ('Delete a node group by name', _build_delete_parser),
+    })
+
+def _build_add_parser(add_parser):
+    """Adds the arguments of the `add` action under `nodegroup`."""
     add_parser.add_argument('--name', required=True, help='Name of the node group')
     add_parser.add_argument('--description', help='Description of the node group')
     add_parser.set_defaults(func=add_nodegroup)
 
-    # nodegroup list
-    list_parser = nodegroup_subparsers.add_parser('list', help='List all node groups in a cluster')
+def _build_list_parser(list_parser):
+    """Adds the arguments of the `list` action under `nodegroup`."""
     list_parser.add_argument('--cluster', help='Cluster name or UID (optional, will auto-select if only one cluster exists)')
     list_parser.add_argument('--output', '-o', choices=['default', 'dot', 'json'], default='default', help='Output format (default: text)')
+    list_parser.add_argument('--pretty', action='store_true', help='Indent JSON output even when stdout is not a terminal')
     list_parser.set_defaults(func=list_nodegroups)
 
-    # nodegroup get
-    get_parser = nodegroup_subparsers.add_parser('get', help='Get all properties of one or more node groups')
+def _build_get_parser(get_parser):
+    """Adds the arguments of the `get` action under `nodegroup`."""
     get_parser.add_argument('--cluster', help='Cluster name or UID (optional, will auto-select if only one cluster exists)')
     get_parser.add_argument('--name', '-n', nargs='+', help='List of node group names to show')
     get_parser.add_argument('--output', '-o', choices=['text', 'json'], default='text', help='Output format (default: text)')
+    get_parser.add_argument('--pretty', action='store_true', help='Indent JSON output even when stdout is not a terminal')
     get_parser.add_argument('--filter', help='Comma-separated list of fields to display (e.g., "name,description")')
     get_parser.set_defaults(func=get_nodegroups)
 
-    # nodegroup delete
-    delete_parser = nodegroup_subparsers.add_parser('delete', help='Delete a node group by name')
+def _build_delete_parser(delete_parser):
+    """Adds the arguments of the `delete` action under `nodegroup`."""
     delete_parser.add_argument('name', help='Name of the node group')
     delete_parser.set_defaults(func=delete_nodegroup)
 
@@ -43,33 +56,27 @@ def add_nodegroup(args, client):
         "description": args.description,
     }
     result = client.post("nodegroups", data)
-    logging.info(f"Node group '{args.name}' added successfully")
+    log.info("Node group '%s' added successfully", args.name)
     return result
 
 def list_nodegroups(args, client):
     """Lists the node groups in a cluster with support for multiple output formats."""
     try:
-        # If no cluster is specified, fetch all clusters
-        if not args.cluster:
-            clusters = client.get("clusters")
-            if not clusters or not isinstance(clusters, list):
-                logging.error("No clusters found.")
-                return None
-        else:
-            # Fetch only the specified cluster
-            cluster_uid = get_cluster_uid(client, args.cluster)
-            clusters = [{"name": args.cluster, "uid": cluster_uid}]
+        # The cluster named by --cluster, or all clusters
+        clusters = resolve_clusters(args, client)
+        if clusters is None:
+            return None
 
         nodegroup_dict = {}
 
-        for cluster in clusters:
+        # Fetch nodegroups for all clusters concurrently
+        results = fetch_per_cluster(clusters, lambda uid: client.get(f"clusters/{uid}/nodeGroups"))
+
+        for cluster, nodegroups in results:
             cluster_name = cluster.get('name')
-            cluster_uid = cluster.get('uid')
 
-            # Fetch nodegroups for this cluster
-            nodegroups = client.get(f"clusters/{cluster_uid}/nodeGroups")
             if not nodegroups:
-                logging.warning(f"No node groups found for cluster {cluster_name}.")
+                log.warning("No node groups found for cluster %s.", cluster_name)
                 continue
 
             # Add nodegroup names to the dictionary under their respective cluster
@@ -82,28 +89,26 @@ def list_nodegroups(args, client):
         # Output format handling
         if args.output == 'json':
             # JSON format with cluster as the key and node group names as the list
-            print(json.dumps(nodegroup_dict, indent=4))
+            print_json(nodegroup_dict, pretty=pretty_json(args))
         
         elif args.output == 'dot':
             # Dot notation format
-            output_lines = []
-            for cluster_name, nodegroups in nodegroup_dict.items():
-                for i, nodegroup in enumerate(nodegroups):
-                    output_lines.append(f"cluster[{cluster_name}].nodegroup[{i}].name: {nodegroup}")
-            print("\n".join(output_lines))
+            fmt = "cluster[{}].nodegroup[{}].name: {}\n".format
+            sys.stdout.writelines(
+                fmt(cluster_name, i, nodegroup)
+                for cluster_name, nodegroups in nodegroup_dict.items()
+                for i, nodegroup in enumerate(nodegroups)
+            )
         
         else:
             # Default format with cluster name as a header and a blank line between clusters
-            output_lines = []
             for cluster_name, nodegroups in nodegroup_dict.items():
-                output_lines.append(f"[{cluster_name}]")
-                for nodegroup in nodegroups:
-                    output_lines.append(f"{nodegroup}")
-                output_lines.append("")  # Add a blank line after each cluster's node groups
-            print("\n".join(output_lines))
-
-    except Exception as e:
-        logging.error(f"Failed to fetch node groups: {e}")
+                sys.stdout.write(f"[{cluster_name}]\n")
+                sys.stdout.writelines(f"{nodegroup}\n" for nodegroup in nodegroups)
+                sys.stdout.write("\n")  # Blank line after each cluster
+
+    except EXPECTED_ERRORS as e:
+        log.error("Failed to fetch node groups: %s", e)
         return None
 
 
@@ -111,18 +116,18 @@ def list_nodegroups(args, client):
 def list_nodegroups_by_cluster_uid(cluster_uid, client):
     """Lists all node groups in a cluster using the cluster UID directly."""
     try:
-        logging.info(f"Fetching node groups for cluster UID: {cluster_uid}")
+        log.info("Fetching node groups for cluster UID: %s", cluster_uid)
         nodegroups = client.get(f"clusters/{cluster_uid}/nodeGroups")
 
         # Ensure the response is a list of node groups
         if not isinstance(nodegroups, list):
-            logging.error(f"Unexpected response type: {type(nodegroups)}. Expected list.")
+            log.error("Unexpected response type: %s. Expected list.", type(nodegroups))
             return None
 
         return nodegroups
 
-    except Exception as e:
-        logging.error(f"Failed to fetch node groups for cluster {cluster_uid}: {e}")
+    except EXPECTED_ERRORS as e:
+        log.error("Failed to fetch node groups for cluster %s: %s", cluster_uid, e)
         return None
 
 def get_nodegroup(args, client):
@@ -133,71 +138,67 @@ def get_nodegroup(args, client):
 def get_nodegroups(args, client):
     """Shows all properties of one or more node groups in a cluster."""
     try:
-        # If no cluster is specified, fetch all clusters
-        if not args.cluster:
-            clusters = client.get("clusters")
-            if not clusters or not isinstance(clusters, list):
-                logging.error("No clusters found.")
-                return None
-        else:
-            # Fetch only the specified cluster
-            cluster_uid = get_cluster_uid(client, args.cluster)
-            clusters = [{"name": args.cluster, "uid": cluster_uid}]
+        # The cluster named by --cluster, or all clusters
+        clusters = resolve_clusters(args, client)
+        if clusters is None:
+            return None
 
-        all_nodegroups = []
+        # Matching node groups grouped by cluster, collected for JSON output only
+        nodegroup_output = {}
+        found = False
+        wanted_names = set(args.name) if args.name else None
+        filters = args.filter.split(',') if args.filter else None
+        # Ask the API for just the filtered fields (plus the name used by --name)
+        params = projection_params(filters, required=('name',) if wanted_names else ())
 
-        for cluster in clusters:
+        # Fetch nodegroups for all clusters concurrently, handling each cluster as it arrives
+        results = iter_per_cluster(clusters, lambda uid: client.get(f"clusters/{uid}/nodeGroups", params=params))
+
+        for cluster, nodegroups in results:
             cluster_name = cluster.get('name')
-            cluster_uid = cluster.get('uid')
 
-            # Fetch nodegroups for this cluster
-            nodegroups = client.get(f"clusters/{cluster_uid}/nodeGroups")
             if not nodegroups:
-                logging.warning(f"No node groups found for cluster {cluster_name}.")
+                log.warning("No node groups found for cluster %s.", cluster_name)
                 continue
 
             # If --name is provided, filter node groups by the given names
-            if args.name:
-                nodegroups = [ng for ng in nodegroups if ng['name'] in args.name]
+            if wanted_names:
+                nodegroups = [ng for ng in nodegroups if ng['name'] in wanted_names]
 
             if not nodegroups:
-                logging.info(f"No matching node groups found for cluster {cluster_name}.")
+                log.info("No matching node groups found for cluster %s.", cluster_name)
                 continue
 
             # Apply filter if provided
-            if args.filter:
-                filters = args.filter.split(',')
+            if filters:
                 nodegroups = filter_json(nodegroups, filters)
 
-            # Flatten each nodegroup and prefix with the cluster name
-            for i, nodegroup in enumerate(nodegroups):
-                flattened_nodegroup = flatten_json(nodegroup, parent_key=f"cluster[{cluster_name}].nodegroup[{i}]")
-                all_nodegroups.append(flattened_nodegroup)
-
-        if not all_nodegroups:
+            found = True
+            if args.output == 'json':
+                # JSON keeps the objects nested and is written once complete
+                nodegroup_output.setdefault(cluster_name, []).extend(nodegroups)
+            else:
+                # Text output: flatten each nodegroup, prefixed with the cluster name, and write it right away
+                sys.stdout.writelines(
+                    f"{key}: {value}\n"
+                    for nodegroup in flatten_many(nodegroups, f"cluster[{cluster_name}].nodegroup")
+                    for key, value in nodegroup.items()
+                )
+
+        if not found:
             print("No matching node groups found.")
             return
 
-        # If JSON output is requested
         if args.output == 'json':
-            print(json.dumps(all_nodegroups, indent=4))
-            return
-
-        # Prepare text output
-        output_lines = []
-        for nodegroup in all_nodegroups:
-            for key, value in nodegroup.items():
-                output_lines.append(f"{key}: {value}")
-
-        print("\n".join(output_lines))
+            print_json(nodegroup_output, pretty=pretty_json(args))
 
-    except Exception as e:
-        logging.error(f"Failed to fetch node groups: {e}")
+    except EXPECTED_ERRORS as e:
+        log.error("Failed to fetch node groups: %s", e)
         return None
 
 def delete_nodegroup(args, client):
     """Deletes a node group by name."""
     success = client.delete(f"nodegroups/{args.name}")
     if success:
-        logging.info(f"Node group {args.name} deleted successfully")
+        log.info("Node group %s deleted successfully", args.name)
     return success
@@ -1,6 +1,10 @@
-import json
 import logging
-from utils import flatten_json, get_cluster_uid, filter_json
+import sys
+from api_client import EXPECTED_ERRORS
+from utils import add_action_parsers, flatten_many, resolve_clusters, filter_json, projection_params, fetch_per_cluster, iter_per_cluster, print_json, pretty_json
+
+# Messages use %-style arguments so filtered-out levels cost no formatting
+log = logging.getLogger(__name__)
 
 def setup_parser(subparsers):
     """
@@ -19,42 +23,45 @@ def setup_parser(subparsers):
     # Create subparsers for actions under `node`
     node_subparsers = node_parser.add_subparsers(dest='action')
 
-    # Create `list` action under `node`
-    list_parser = node_subparsers.add_parser('list', help='List node names in a cluster or all clusters')
+    # Only the arguments of the requested action are built
+    add_action_parsers(node_subparsers, 'node', {
+        'list': ('List node names in a cluster or all clusters', _build_list_parser),
+        'get': ('Get details of nodes in a cluster or all clusters', _build_get_parser),
+    })
+
+def _build_list_parser(list_parser):
+    """Adds the arguments of the `list` action under `node`."""
     list_parser.add_argument('--cluster', help='The name of the cluster to list nodes for (optional)')
     list_parser.add_argument('--output', '-o', choices=['default', 'dot', 'json'], default='default', help='Output format (default, dot, or json)')
+    list_parser.add_argument('--pretty', action='store_true', help='Indent JSON output even when stdout is not a terminal')
     list_parser.set_defaults(func=list_nodes)
 
-    # Create `get` action under `node`
-    get_parser = node_subparsers.add_parser('get', help='Get details of nodes in a cluster or all clusters')
+def _build_get_parser(get_parser):
+    """Adds the arguments of the `get` action under `node`."""
     get_parser.add_argument('--cluster', help='The name of the cluster to get node details for (optional)')
     get_parser.add_argument('--output', choices=['text', 'json'], default='text', help='Output format (text or json)')
+    get_parser.add_argument('--pretty', action='store_true', help='Indent JSON output even when stdout is not a terminal')
     get_parser.add_argument('--filter', help='Comma-separated list of fields to filter the output')
     get_parser.set_defaults(func=get_node)
 
 def list_nodes(args, client):
     """Lists the names of nodes in a cluster or from all clusters."""
     try:
-        # If no cluster is specified, fetch all clusters
-        if not args.cluster:
-            clusters = client.get("clusters")
-            if not clusters or not isinstance(clusters, list):
-                logging.error("No clusters found.")
-                return None
-        else:
-            # Fetch only the specified cluster
-            cluster_uid = get_cluster_uid(client, args.cluster)
-            clusters = [{"name": args.cluster, "uid": cluster_uid}]
+        # The cluster named by --cluster, or all clusters
+        clusters = resolve_clusters(args, client)
+        if clusters is None:
+            return None
 
         node_dict = {}
 
-        for cluster in clusters:
+        # Fetch nodes for all clusters concurrently
+        results = fetch_per_cluster(clusters, lambda uid: list_nodes_by_cluster_uid(uid, client))
+
+        for cluster, nodes in results:
             cluster_name = cluster.get('name')
-            cluster_uid = cluster.get('uid')
 
-            nodes = list_nodes_by_cluster_uid(cluster_uid, client)
             if not nodes:
-                logging.warning(f"No nodes found for cluster {cluster_name}.")
+                log.warning("No nodes found for cluster %s.", cluster_name)
                 continue
 
             # Only extract node names
@@ -66,117 +73,104 @@ def list_nodes(args, client):
 
         # Output format handling
         if args.output == 'json':
-            # JSON format
-            print(json.dumps(node_dict, indent=4))
+            # Node names grouped by cluster name
+            print_json(node_dict, pretty=pretty_json(args))
         
         elif args.output == 'dot':
             # Dot notation format
-            output_lines = []
-            for cluster_name, nodes in node_dict.items():
-                for i, node in enumerate(nodes):
-                    output_lines.append(f"cluster[{cluster_name}].node[{i}].name: {node}")
-            print("\n".join(output_lines))
+            fmt = "cluster[{}].node[{}].name: {}\n".format
+            sys.stdout.writelines(
+                fmt(cluster_name, i, node)
+                for cluster_name, nodes in node_dict.items()
+                for i, node in enumerate(nodes)
+            )
         
         else:
             # Default format with cluster name as a header
-            output_lines = []
             for cluster_name, nodes in node_dict.items():
-                output_lines.append(f"[{cluster_name}]")
-                for node in nodes:
-                    output_lines.append(f"{node}")
-                output_lines.append("")  # Add blank line after each cluster
-            print("\n".join(output_lines))
-
-    except Exception as e:
-        logging.error(f"Failed to list nodes: {e}")
+                sys.stdout.write(f"[{cluster_name}]\n")
+                sys.stdout.writelines(f"{node}\n" for node in nodes)
+                sys.stdout.write("\n")  # Blank line after each cluster
+
+    except EXPECTED_ERRORS as e:
+        log.error("Failed to list nodes: %s", e)
         return None
 
 def get_node(args, client):
     """Gets detailed information about nodes in a cluster or from all clusters."""
     try:
-        # If no cluster is specified, fetch all clusters
-        if not args.cluster:
-            clusters = client.get("clusters")
-            if not clusters or not isinstance(clusters, list):
-                logging.error("No clusters found.")
-                return None
-        else:
-            # Fetch only the specified cluster
-            cluster_uid = get_cluster_uid(client, args.cluster)
-            clusters = [{"name": args.cluster, "uid": cluster_uid}]
+        # The cluster named by --cluster, or all clusters
+        clusters = resolve_clusters(args, client)
+        if clusters is None:
+            return None
+
+        # Nodes grouped by cluster, collected for JSON output only
+        node_output = {}
+        found = False
+        filters = args.filter.split(',') if args.filter else None
+        # Ask the API for just the filtered fields
+        params = projection_params(filters)
 
-        all_nodes = []
+        # Fetch nodes for all clusters concurrently, handling each cluster as it arrives
+        results = iter_per_cluster(clusters, lambda uid: list_nodes_by_cluster_uid(uid, client, params=params))
 
-        for cluster in clusters:
+        for cluster, nodes in results:
             cluster_name = cluster.get('name')
-            cluster_uid = cluster.get('uid')
 
-            nodes = list_nodes_by_cluster_uid(cluster_uid, client)
             if not nodes:
-                logging.warning(f"No nodes found for cluster {cluster_name}.")
+                log.warning("No nodes found for cluster %s.", cluster_name)
                 continue
 
             # Apply filter if provided
-            if args.filter:
-                filters = args.filter.split(',')
+            if filters:
                 nodes = filter_json(nodes, filters)
 
-            for i, node in enumerate(nodes):
-                # Add node details to the list under their respective cluster
-                all_nodes.append({
-                    'cluster': cluster_name,
-                    'node': flatten_json(node, parent_key=f"cluster[{cluster_name}].node[{i}]")
-                })
-
-        if not all_nodes:
+            found = True
+            if args.output == 'json':
+                # JSON keeps the objects nested and is written once complete
+                node_output.setdefault(cluster_name, []).extend(nodes)
+            else:
+                # Text output: flatten each node, prefixed with the cluster name, and write it right away
+                sys.stdout.writelines(
+                    f"{key}: {value}\n"
+                    for node in flatten_many(nodes, f"cluster[{cluster_name}].node")
+                    for key, value in node.items()
+                )
+
+        if not found:
             print("No node details found.")
             return
 
-        # Output format handling
         if args.output == 'json':
-            # JSON format
-            node_output = {}
-            for node in all_nodes:
-                cluster_name = node['cluster']
-                if cluster_name not in node_output:
-                    node_output[cluster_name] = []
-                node_output[cluster_name].append(node['node'])
-            print(json.dumps(node_output, indent=4))
+            print_json(node_output, pretty=pretty_json(args))
 
-        else:
-            # Text output
-            output_lines = []
-            for node in all_nodes:
-                for key, value in node['node'].items():
-                    output_lines.append(f"{key}: {value}")
-            print("\n".join(output_lines))
-
-    except Exception as e:
-        logging.error(f"Failed to get node details: {e}")
+    except EXPECTED_ERRORS as e:
+        log.error("Failed to get node details: %s", e)
         return None
 
-def list_nodes_by_cluster_uid(cluster_uid, client):
+def list_nodes_by_cluster_uid(cluster_uid, client, params=None):
     """
     Fetches the list of nodes for a given cluster UID using the provided API client.
     
     Args:
         cluster_uid (str): The UID of the cluster.
         client: The API client used for making requests.
+        params (dict): Optional query parameters, e.g. a field projection.
     
     Returns:
         list or None: A list of nodes or None if the request fails.
     """
     try:
-        logging.info(f"Fetching nodes for cluster UID: {cluster_uid}")
-        nodes = client.get(f"clusters/{cluster_uid}/nodes")
+        log.info("Fetching nodes for cluster UID: %s", cluster_uid)
+        nodes = client.get(f"clusters/{cluster_uid}/nodes", params=params)
 
         # Ensure the response is a list
         if not isinstance(nodes, list):
-            logging.error(f"Unexpected response type: {type(nodes)}. Expected list.")
+            log.error("Unexpected response type: %s. Expected list.", type(nodes))
             return None
 
         return nodes
 
-    except Exception as e:
-        logging.error(f"Failed to fetch nodes for cluster {cluster_uid}: {e}")
+    except EXPECTED_ERRORS as e:
+        log.error("Failed to fetch nodes for cluster %s: %s", cluster_uid, e)
         return None
@@ -1,6 +1,9 @@
-import json
 import logging
-from utils import flatten_json, get_cluster_uid, filter_json
+import sys
+from api_client import EXPECTED_ERRORS
+from utils import add_action_parsers, flatten_many, resolve_clusters, filter_json, fetch_per_cluster, print_json, pretty_json
+
+log = logging.getLogger(__name__)
 
 def setup_parser(subparsers):
     """Sets up the argparse subcommands for projects."""
@@ -11,34 +14,45 @@ def setup_parser(subparsers):
     )
     project_subparsers = project_parser.add_subparsers(dest='action', help='Action to perform')
 
-    # project add
-    add_parser = project_subparsers.add_parser('add', help='Add a new project')
+    # Only the arguments of the requested action are built
+    add_action_parsers(project_subparsers, 'project', {
+        'add': ('Add a new project', _build_add_parser),
+        'list': ('List project names in a cluster or all clusters', _build_list_parser),
+        'get': ('Get detailed information for projects in a cluster', _build_get_parser),
+        'update': ('Update a project by name', _build_update_parser),
+        'delete': ('Delete a project by name', _build_delete_parser),
+    })
+
+def _build_add_parser(add_parser):
+    """Adds the arguments of the `add` action under `project`."""
     add_parser.add_argument('--name', required=True, help='Name of the project')
     add_parser.add_argument('--description', help='Description of the project')
     add_parser.set_defaults(func=add_project)
 
-    # project list
-    list_parser = project_subparsers.add_parser('list', help='List project names in a cluster or all clusters')
+def _build_list_parser(list_parser):
+    """Adds the arguments of the `list` action under `project`."""
     list_parser.add_argument('--cluster', help='Cluster name or UID (optional, will auto-select if only one cluster exists)')
     list_parser.add_argument('--output', '-o', choices=['default', 'dot', 'json'], default='default', help='Output format (default, dot, or json)')
+    list_parser.add_argument('--pretty', action='store_true', help='Indent JSON output even when stdout is not a terminal')
     list_parser.set_defaults(func=list_projects)
 
-    # project get
-    get_parser = project_subparsers.add_parser('get', help='Get detailed information for projects in a cluster')
+def _build_get_parser(get_parser):
+    """Adds the arguments of the `get` action under `project`."""
     get_parser.add_argument('--cluster', help='Cluster name or UID (optional, will auto-select if only one cluster exists)')
     get_parser.add_argument('--output', choices=['text', 'json'], default='text', help='Output format (text or json)')
+    get_parser.add_argument('--pretty', action='store_true', help='Indent JSON output even when stdout is not a terminal')
     get_parser.add_argument('--filter', help='Comma-separated list of fields to display (e.g., "name,description")')
     get_parser.set_defaults(func=get_projects)
 
-    # project update
-    update_parser = project_subparsers.add_parser('update', help='Update a project by name')
+def _build_update_parser(update_parser):
+    """Adds the arguments of the `update` action under `project`."""
     update_parser.add_argument('name', help='Name of the project')
     update_parser.add_argument('--new-name', help='New name for the project')
     update_parser.add_argument('--description', help='New description for the project')
     update_parser.set_defaults(func=update_project)
 
-    # project delete
-    delete_parser = project_subparsers.add_parser('delete', help='Delete a project by name')
+def _build_delete_parser(delete_parser):
+    """Adds the arguments of the `delete` action under `project`."""
     delete_parser.add_argument('name', help='Name of the project')
     delete_parser.set_defaults(func=delete_project)
 
@@ -49,33 +63,27 @@ def add_project(args, client):
         "description": args.description,
     }
     result = client.post("projects", data)
-    logging.info(f"Project '{args.name}' added successfully")
+    log.info("Project '%s' added successfully", args.name)
     return result
 
 def list_projects(args, client):
     """Lists the names of projects in a cluster or from all clusters."""
     try:
-        # If no cluster is specified, fetch all clusters
-        if not args.cluster:
-            clusters = client.get("clusters")
-            if not clusters or not isinstance(clusters, list):
-                logging.error("No clusters found.")
-                return None
-        else:
-            # Fetch only the specified cluster
-            cluster_uid = get_cluster_uid(client, args.cluster)
-            clusters = [{"name": args.cluster, "uid": cluster_uid}]
+        # The cluster named by --cluster, or all clusters
+        clusters = resolve_clusters(args, client)
+        if clusters is None:
+            return None
 
         project_dict = {}
 
-        for cluster in clusters:
+        # Fetch projects for all clusters concurrently
+        results = fetch_per_cluster(clusters, lambda uid: client.get(f"clusters/{uid}/projects"))
+
+        for cluster, projects in results:
             cluster_name = cluster.get('name')
-            cluster_uid = cluster.get('uid')
 
-            # Fetch projects for this cluster
-            projects = client.get(f"clusters/{cluster_uid}/projects")
             if not projects:
-                logging.warning(f"No projects found for cluster {cluster_name}.")
+                log.warning("No projects found for cluster %s.", cluster_name)
                 continue
 
             # Only extract project names
@@ -88,93 +96,75 @@ def list_projects(args, client):
         # Output format handling
         if args.output == 'json':
             # JSON format
-            print(json.dumps(project_dict, indent=4))
+            print_json(project_dict, pretty=pretty_json(args))
         
         elif args.output == 'dot':
             # Dot notation format
-            output_lines = []
             for cluster_name, projects in project_dict.items():
-                for i, project in enumerate(projects):
-                    output_lines.append(f"cluster[{cluster_name}].project[{i}].name: {project}")
-            print("\n".join(output_lines))
+                # The cluster part of the key is formatted once per cluster
+                prefix = f"cluster[{cluster_name}].project"
+                sys.stdout.writelines(f"{prefix}[{i}].name: {project}\n" for i, project in enumerate(projects))
         
         else:
             # Default format with cluster name as a header
-            output_lines = []
             for cluster_name, projects in project_dict.items():
-                output_lines.append(f"[{cluster_name}]")
-                for project in projects:
-                    output_lines.append(f"{project}")
-                output_lines.append("")  # Add blank line after each cluster
-            print("\n".join(output_lines))
-
-    except Exception as e:
-        logging.error(f"Failed to list projects: {e}")
+                sys.stdout.write(f"[{cluster_name}]\n")
+                sys.stdout.writelines(f"{project}\n" for project in projects)
+                sys.stdout.write("\n")  # Blank line after each cluster
+
+    except EXPECTED_ERRORS as e:
+        log.error("Failed to list projects: %s", e)
         return None
 
 def get_projects(args, client):
     """Gets properties for each project in a cluster or from all clusters."""
     try:
-        # If no cluster is specified, fetch all clusters
-        if not args.cluster:
-            clusters = client.get("clusters")
-            if not clusters or not isinstance(clusters, list):
-                logging.error("No clusters found.")
-                return None
-        else:
-            # Fetch only the specified cluster
-            cluster_uid = get_cluster_uid(client, args.cluster)
-            clusters = [{"name": args.cluster, "uid": cluster_uid}]
+        # The cluster named by --cluster, or all clusters
+        clusters = resolve_clusters(args, client)
+        if clusters is None:
+            return None
+
+        # Flattened projects grouped by cluster, shared by both output formats
+        project_output = {}
+        filters = args.filter.split(',') if args.filter else None
 
-        all_projects = []
+        # Fetch projects for all clusters concurrently
+        results = fetch_per_cluster(clusters, lambda uid: client.get(f"clusters/{uid}/projects"))
 
-        for cluster in clusters:
+        for cluster, projects in results:
             cluster_name = cluster.get('name')
-            cluster_uid = cluster.get('uid')
 
-            # Fetch projects for this cluster
-            projects = client.get(f"clusters/{cluster_uid}/projects")
             if not projects:
-                logging.warning(f"No projects found for cluster {cluster_name}.")
+                log.warning("No projects found for cluster %s.", cluster_name)
                 continue
 
             # Apply filter if provided
-            if args.filter:
-                filters = args.filter.split(',')
+            if filters:
                 projects = filter_json(projects, filters)
 
-            # Add project details to the list under their respective cluster
-            for i, project in enumerate(projects):
-                all_projects.append({
-                    'cluster': cluster_name,
-                    'project': flatten_json(project, parent_key=f"cluster[{cluster_name}].project[{i}]")
-                })
+            # Add project details under their respective cluster
+            project_output.setdefault(cluster_name, []).extend(flatten_many(projects, f"cluster[{cluster_name}].project"))
 
-        if not all_projects:
+        if not project_output:
             print("No project details found.")
             return
 
         # Output format handling
         if args.output == 'json':
             # JSON format
-            project_output = {}
-            for project in all_projects:
-                cluster_name = project['cluster']
-                if cluster_name not in project_output:
-                    project_output[cluster_name] = []
-                project_output[cluster_name].append(project['project'])
-            print(json.dumps(project_output, indent=4))
+            print_json(project_output, pretty=pretty_json(args))
 
         else:
-            # Text output
-            output_lines = []
-            for project in all_projects:
-                for key, value in project['project'].items():
-                    output_lines.append(f"{key}: {value}")
-            print("\n".join(output_lines))
-
-    except Exception as e:
-        logging.error(f"Failed to get project details: {e}")
+            # Text output, written as it is formatted
+            sys.stdout.writelines(
+                f"{key}: {value}\n"
+                for projects in project_output.values()
+                for project in projects
+                for key, value in project.items()
+            )
+
+    except EXPECTED_ERRORS as e:
+        log.error("Failed to get project details: %s", e)
         return None
 
 def list_projects_by_cluster_uid(cluster_uid, client):
@@ -189,18 +179,18 @@ def list_projects_by_cluster_uid(cluster_uid, client):
         list or str: A list of projects or an error message if the request fails.
     """
     try:
-        logging.info(f"Fetching projects for cluster UID: {cluster_uid}")
+        log.info("Fetching projects for cluster UID: %s", cluster_uid)
         projects = client.get(f"clusters/{cluster_uid}/projects")
 
         # Ensure the response is a list (the expected type)
         if not isinstance(projects, list):
-            logging.error(f"Unexpected response type: {type(projects)}. Expected list.")
+            log.error("Unexpected response type: %s. Expected list.", type(projects))
             return None
 
         return projects
 
-    except Exception as e:
-        logging.error(f"Failed to fetch projects for cluster {cluster_uid}: {e}")
+    except EXPECTED_ERRORS as e:
+        log.error("Failed to fetch projects for cluster %s: %s", cluster_uid, e)
         return None
 
 def update_project(args, client):
@@ -212,16 +202,16 @@ def update_project(args, client):
         data['description'] = args.description
 
     if not data:
-        logging.error("No updates provided.")
+        log.error("No updates provided.")
         return None
 
     result = client.put(f"projects/{args.name}", data)
-    logging.info(f"Project '{args.name}' updated successfully")
+    log.info("Project '%s' updated successfully", args.name)
     return result
 
 def delete_project(args, client):
     """Deletes a project by name."""
     success = client.delete(f"projects/{args.name}")
     if success:
-        logging.info(f"Project '{args.name}' deleted successfully")
+        log.info("Project '%s' deleted successfully", args.name)
     return success
@@ -1,10 +1,38 @@
+import hashlib
+import io
+import json
 import logging
-from kubernetes import client, config
-from kubernetes.config.config_exception import ConfigException
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from .department import list_departments, list_departments_by_cluster_uid
 from .nodegroup import list_nodegroups, list_nodegroups_by_cluster_uid
 from .project import list_projects, list_projects_by_cluster_uid
-import logging
+from api_client import CACHE_DIR, write_cache_file
+from utils import MAX_FETCH_WORKERS
+
+# Use the faster orjson decoder when it is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+log = logging.getLogger(__name__)
+
+# Indentation added per level of the printed tree
+TREE_INDENT = "│   "
+
+# Items requested per page from Kubernetes list calls
+K8S_PAGE_SIZE = 500
+
+# Seconds a fetched Kubernetes topology is reused by later invocations
+K8S_CACHE_TTL = 30
+
+# Optional sections of the MMAI topology; projects are shown under departments
+MMAI_SECTIONS = ('nodegroups', 'departments', 'projects')
 
 def setup_parser(subparsers):
     """Sets up the argparse subcommands for displaying topologies."""
@@ -17,6 +45,10 @@ def setup_parser(subparsers):
     # Options for selecting the type of topology
     topology_parser.add_argument('--k8s', action='store_true', help='Show Kubernetes cluster topology')
     topology_parser.add_argument('--mmai', action='store_true', help='Show MMAI hardware/software topology')
+    topology_parser.add_argument('--cache-ttl', type=float, default=K8S_CACHE_TTL,
+                                 help=f'Seconds to reuse a cached Kubernetes topology (default: {K8S_CACHE_TTL}, 0 disables; see also --no-cache)')
+    topology_parser.add_argument('--include', default=','.join(MMAI_SECTIONS),
+                                 help=f"Comma-separated MMAI sections to fetch and show (default: {','.join(MMAI_SECTIONS)})")
     topology_parser.set_defaults(func=topology_view)
 
 def topology_view(args, client):
@@ -32,28 +64,44 @@ def topology_view(args, client):
             print("Error: You must specify either --k8s or --mmai to display the topology.")
     
     except Exception as e:
-        logging.error(f"Error displaying topology: {str(e)}")
+        log.error("Error displaying topology: %s", e)
         return f"Error: {str(e)}"
 
 
 # Kubernetes Topology Function
-def fetch_k8s_topology():
+def fetch_k8s_topology(cache_ttl=0, refresh=False):
     """
     Fetches the Kubernetes topology, including namespaces, nodes, pods, and services.
     Handles errors related to kubeconfig loading, permissions, and API access.
     
+    Args:
+        cache_ttl (float): Seconds a topology cached on disk for the current kubeconfig cluster
+            is reused instead of listing the cluster again; 0 disables the cache.
+        refresh (bool): List the cluster even if a cached topology is still fresh, and cache the result.
+
     Returns:
         dict: A structured dictionary representing the Kubernetes cluster topology or an error message.
     """
     topology_data = {}
 
+    # The Kubernetes client is slow to import, so only --k8s pays for it
+    try:
+        from kubernetes import client, config
+        from kubernetes.config.config_exception import ConfigException
+    except ImportError:
+        log.error("The kubernetes package is not installed. Install it with `pip install kubernetes`.")
+        return {
+            "error": "Kubernetes client not installed.",
+            "suggestion": "Install the Kubernetes Python client with `pip install kubernetes` (see requirements.txt)."
+        }
+
     try:
         # Load Kubernetes configuration
         config.load_kube_config()  # This will use the default kubeconfig (~/.kube/config)
 
     except FileNotFoundError:
         # Handle missing kubeconfig file
-        logging.error("Kubeconfig file not found. Please make sure the kubeconfig file exists at '~/.kube/config' or provide a valid file using the KUBECONFIG environment variable.")
+        log.error("Kubeconfig file not found. Please make sure the kubeconfig file exists at '~/.kube/config' or provide a valid file using the KUBECONFIG environment variable.")
         return {
             "error": "Kubeconfig file not found.",
             "suggestion": "Please make sure the kubeconfig file exists at '~/.kube/config' or set the KUBECONFIG environment variable to the correct file location."
@@ -61,7 +109,7 @@ def fetch_k8s_topology():
     
     except ConfigException as e:
         # Handle invalid kubeconfig file or other config-related issues
-        logging.error(f"Invalid kubeconfig file: {e}. Ensure the file is correctly formatted and accessible.")
+        log.error("Invalid kubeconfig file: %s. Ensure the file is correctly formatted and accessible.", e)
         return {
             "error": "Invalid kubeconfig file.",
             "suggestion": "Please ensure that the kubeconfig file is correctly formatted and accessible. You can check it with `kubectl config view` or recreate it from the Kubernetes cluster."
@@ -69,52 +117,58 @@ def fetch_k8s_topology():
 
     except PermissionError:
         # Handle file permission errors
-        logging.error("Permission denied: Unable to read the kubeconfig file. Please check the file permissions.")
+        log.error("Permission denied: Unable to read the kubeconfig file. Please check the file permissions.")
         return {
             "error": "Permission denied to read kubeconfig.",
             "suggestion": "Ensure the kubeconfig file has the correct permissions. Use `chmod 600 ~/.kube/config` to set appropriate permissions."
         }
 
+    cache_file = _k8s_cache_file(config) if cache_ttl > 0 else None
+    if cache_file and not refresh:
+        cached = _read_k8s_cache(cache_file, cache_ttl)
+        if cached is not None:
+            log.info("Using Kubernetes topology cached in %s", cache_file)
+            return cached
+
     try:
         # Initialize Kubernetes API client
         v1 = client.CoreV1Api()
 
-        # Fetch all namespaces
-        namespaces = v1.list_namespace().items
+        # List each resource type once for the whole cluster and group it locally,
+        # instead of re-listing nodes, pods and services for every namespace.
+        # The four listings are independent, so they run concurrently. Pods and services,
+        # the largest listings, are indexed page by page so only one page is held at a time.
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [
+                executor.submit(_list_all, v1.list_namespace),
+                executor.submit(_list_all, v1.list_node),
+                executor.submit(_index_pods, v1.list_pod_for_all_namespaces),
+                executor.submit(_index_services, v1.list_service_for_all_namespaces),
+            ]
+            namespaces, nodes, pods_by_ns_node, services_by_ns = [future.result() for future in futures]
+
         topology_data['Namespaces'] = []
 
         for namespace in namespaces:
-            ns_data = {'Namespace': namespace.metadata.name, 'Nodes': []}
-
-            # Fetch nodes in the cluster
-            nodes = v1.list_node().items
-            for node in nodes:
-                node_data = {'Node': node.metadata.name, 'Pods': []}
-
-                # Fetch all pods in this namespace
-                pods = v1.list_namespaced_pod(namespace.metadata.name).items
-                for pod in pods:
-                    # Check if the pod is scheduled on this node
-                    if pod.spec.node_name == node.metadata.name:
-                        pod_data = {
-                            'Pod': pod.metadata.name,
-                            'Containers': [container.name for container in pod.spec.containers]
-                        }
-                        node_data['Pods'].append(pod_data)
-
-                ns_data['Nodes'].append(node_data)
-
-            # Fetch services in the namespace
-            services = v1.list_namespaced_service(namespace.metadata.name).items
-            ns_data['Services'] = [{'Service': svc.metadata.name} for svc in services]
-
+            ns_name = _name(namespace)
+            pods_by_node = pods_by_ns_node.get(ns_name, {})
+            ns_data = {
+                'Namespace': ns_name,
+                'Nodes': [
+                    {'Node': _name(node), 'Pods': pods_by_node.get(_name(node), [])}
+                    for node in nodes
+                ],
+                'Services': services_by_ns.get(ns_name, []),
+            }
             topology_data['Namespaces'].append(ns_data)
 
+        if cache_file:
+            _write_k8s_cache(cache_file, topology_data)
         return topology_data
 
     except client.exceptions.ApiException as e:
         # Handle Kubernetes API errors (e.g., authentication issues)
-        logging.error(f"Kubernetes API error: {e}")
+        log.error("Kubernetes API error: %s", e)
         return {
             "error": "Kubernetes API error.",
             "suggestion": "Please verify your kubeconfig file and ensure you have access to the Kubernetes cluster. Try running `kubectl get nodes` to confirm."
@@ -122,66 +176,185 @@ def fetch_k8s_topology():
 
     except Exception as e:
         # Handle any other unexpected errors
-        logging.error(f"Unexpected error: {e}")
+        log.error("Unexpected error: %s", e)
         return {
             "error": "Unexpected error occurred.",
             "suggestion": f"An unexpected error occurred: {str(e)}. Please check your environment and try again."
         }
 
 
+def _k8s_cache_file(config):
+    """Returns the topology cache file for the cluster and user of the current kubeconfig context, or None."""
+    try:
+        context = config.list_kube_config_contexts()[1]['context']
+        key = f"{context['cluster']} {context.get('user', '')}"
+    except Exception as e:
+        log.debug("Not caching the Kubernetes topology: %s", e)
+        return None
+    return os.path.join(CACHE_DIR, f"k8s_topology_{hashlib.sha256(key.encode()).hexdigest()[:16]}.json")
+
+
+def _read_k8s_cache(path, ttl):
+    """Returns the topology cached at `path`, or None if it is missing or older than `ttl` seconds."""
+    try:
+        if time.time() - os.path.getmtime(path) >= ttl:
+            return None
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_k8s_cache(path, topology_data):
+    """Saves the topology to `path`; failures only disable the cache."""
+    try:
+        write_cache_file(path, topology_data)
+    except OSError as e:
+        log.debug("Could not write Kubernetes topology cache %s: %s", path, e)
+
+
+def _iter_items(list_call, page_size=K8S_PAGE_SIZE):
+    """
+    Yields every item of a Kubernetes list call as a plain JSON dict, fetching it in pages of
+    `page_size` so large clusters are not returned (and decoded) in one huge response.
+    The raw response body is decoded directly, skipping the client's model objects, which
+    are far slower to build than the handful of fields the topology reads.
+    """
+    token = None
+    while True:
+        kwargs = {'limit': page_size, '_preload_content': False}
+        if token:
+            kwargs['_continue'] = token
+        data = list_call(**kwargs).data
+        page = orjson.loads(data) if orjson is not None else json.loads(data)
+        yield from page.get('items') or []
+        token = (page.get('metadata') or {}).get('continue')
+        if not token:
+            return
+
+
+def _list_all(list_call, page_size=K8S_PAGE_SIZE):
+    """Returns every item of a Kubernetes list call as a list of plain JSON dicts."""
+    return list(_iter_items(list_call, page_size))
+
+
+def _index_pods(list_call):
+    """Returns the pods of a list call as {namespace: {node name: [pod entries]}}."""
+    pods_by_ns_node = defaultdict(lambda: defaultdict(list))
+    for pod in _iter_items(list_call):
+        spec = pod.get('spec') or {}
+        pods_by_ns_node[pod['metadata'].get('namespace')][spec.get('nodeName')].append({
+            'Pod': _name(pod),
+            'Containers': [container['name'] for container in spec.get('containers') or []]
+        })
+    return pods_by_ns_node
+
+
+def _index_services(list_call):
+    """Returns the services of a list call as {namespace: [service entries]}."""
+    services_by_ns = defaultdict(list)
+    for svc in _iter_items(list_call):
+        services_by_ns[svc['metadata'].get('namespace')].append({'Service': _name(svc)})
+    return services_by_ns
+
+
+def _name(obj):
+    """Returns metadata.name of a Kubernetes object dict."""
+    return obj['metadata']['name']
+
+
 def print_tree(data, indent=""):
     """
-    Recursively prints the tree structure for the Kubernetes topology or MMAI topology.
+    Prints the tree structure for the Kubernetes topology or MMAI topology.
     
     Args:
         data (dict): The structured data representing the topology.
         indent (str): Indentation for tree levels.
     """
-    for key, value in data.items():
-        if isinstance(value, dict):
-            print(f"{indent}{key}:")
-            print_tree(value, indent + "│   ")
-        elif isinstance(value, list):
-            print(f"{indent}{key}:")
-            for item in value:
-                print_tree(item, indent + "│   ")
+    # The whole tree is joined and written at once rather than line by line
+    lines = "\n".join(iter_tree_lines(data, indent))
+    if lines:
+        sys.stdout.write(lines)
+        sys.stdout.write("\n")
+
+
+def iter_tree_lines(data, indent=""):
+    """
+    Yields the lines printed by print_tree, walking the data with an explicit stack instead of recursion.
+    
+    Args:
+        data (dict): The structured data representing the topology.
+        indent (str): Indentation for tree levels.
+    """
+    # Each entry is (depth, remaining key/value pairs at that level). The items of a list are
+    # shown one after another at the same level, so their pairs are chained together; plain
+    # values in a list (e.g. container names) have no key and are printed on their own.
+    # The indent of each depth is built once and shared by every line at that depth.
+    indents = [indent]
+    stack = [(0, iter(data.items()))]
+    while stack:
+        depth, entries = stack[-1]
+        indent = indents[depth]
+        for key, value in entries:
+            if isinstance(value, (dict, list)):
+                yield f"{indent}{key}:"
+                if len(indents) == depth + 1:
+                    indents.append(indent + TREE_INDENT)
+                children = iter(value.items()) if isinstance(value, dict) else chain.from_iterable(_list_entries(value))
+                stack.append((depth + 1, children))
+                break
+            elif key is None:
+                yield f"{indent}{value}"
+            else:
+                yield f"{indent}{key}: {value}"
         else:
-            print(f"{indent}{key}: {value}")
+            stack.pop()
+
+
+def _list_entries(items):
+    """Yields the key/value pairs of each dict in a list, and (None, item) for plain values."""
+    for item in items:
+        yield item.items() if isinstance(item, dict) else ((None, item),)
 
 
 def k8s_topology(args):
     """Displays the Kubernetes cluster topology in a tree view format."""
     try:
         # Fetch Kubernetes topology data
-        topology_data = fetch_k8s_topology()
+        topology_data = fetch_k8s_topology(cache_ttl=0 if args.no_cache else args.cache_ttl, refresh=args.refresh)
 
         # Print the tree starting from the cluster level
         print("Kubernetes Cluster:")
         print_tree(topology_data)
 
     except Exception as e:
-        logging.error(f"Error fetching Kubernetes topology: {str(e)}")
+        log.error("Error fetching Kubernetes topology: %s", e)
         return f"Error: {str(e)}"
 
 
 # MMAI Topology Function
-def fetch_mmai_topology(client):
+def fetch_mmai_topology(client, include=MMAI_SECTIONS):
     """
     Fetches the MMAI topology, including clusters, node groups, nodes, hardware, departments, projects, and workloads.
     Uses the existing list functions to obtain information and build the tree structure.
     
+    Args:
+        client: APIClient instance to communicate with the API.
+        include (iterable): The MMAI_SECTIONS to fetch; the API calls of the other sections are skipped.
+
     Returns:
         dict: A structured dictionary representing the MMAI topology or an error message.
     """
     topology_data = {}
 
     try:
-        # Fetch clusters
-        clusters = client.get("clusters")
-        logging.info(f"Clusters fetched: {clusters}")
+        # Fetch clusters. Whole responses are only logged at debug level (-vv), as formatting
+        # them for large clusters is costly and drowns out the progress messages of -v.
+        clusters = client.get_clusters()
+        log.debug("Clusters fetched: %s", clusters)
 
         if not isinstance(clusters, list) or len(clusters) == 0:
-            logging.error("No clusters found.")
+            log.error("No clusters found.")
             return {
                 "error": "No clusters found.",
                 "suggestion": "Please verify that clusters are available in the system and that the API is responding correctly."
@@ -189,31 +362,56 @@ def fetch_mmai_topology(client):
 
         topology_data['Clusters'] = []
 
+        # Fetch the node groups, departments and projects of every cluster concurrently. Node groups
+        # are fetched alongside departments rather than before them, so a cluster costs the latency
+        # of two requests (departments, then their projects) instead of three.
+        def fetch_nodegroups(uid):
+            return list_nodegroups_by_cluster_uid(uid, client) if 'nodegroups' in include else []
+
+        def fetch_departments(uid):
+            departments = list_departments_by_cluster_uid(uid, client) if 'departments' in include else []
+            # Projects are only shown under departments
+            projects = list_projects_by_cluster_uid(uid, client) if departments and 'projects' in include else None
+            return departments, projects
+
+        valid_uids = [cluster['uid'] for cluster in clusters if 'uid' in cluster and 'name' in cluster]
+        with ThreadPoolExecutor(max_workers=max(1, min(MAX_FETCH_WORKERS, 2 * len(valid_uids)))) as executor:
+            nodegroup_futures = [executor.submit(fetch_nodegroups, uid) for uid in valid_uids]
+            department_futures = [executor.submit(fetch_departments, uid) for uid in valid_uids]
+            cluster_lists = {
+                uid: (nodegroups.result(),) + departments.result()
+                for uid, nodegroups, departments in zip(valid_uids, nodegroup_futures, department_futures)
+            }
+
         for cluster in clusters:
             if 'uid' in cluster and 'name' in cluster:
                 cluster_uid = cluster['uid']
                 cluster_name = cluster['name']
-                logging.info(f"Processing cluster {cluster_name} with UID {cluster_uid}")
+                log.info("Processing cluster %s with UID %s", cluster_name, cluster_uid)
             else:
-                logging.error(f"Cluster data missing 'uid' or 'name': {cluster}")
+                log.error("Cluster data missing 'uid' or 'name': %s", cluster)
                 continue
 
-            cluster_data = {'Cluster': cluster_name, 'NodeGroups': [], 'Departments': []}
+            cluster_data = {'Cluster': cluster_name}
+            if 'nodegroups' in include:
+                cluster_data['NodeGroups'] = []
+            if 'departments' in include:
+                cluster_data['Departments'] = []
 
-            # Fetch node groups using list_nodegroups_by_cluster_uid
-            nodegroups = list_nodegroups_by_cluster_uid(cluster_uid, client)
-            logging.info(f"Node groups fetched for cluster {cluster_uid}: {nodegroups}")
+            nodegroups, departments, projects = cluster_lists[cluster_uid]
+            log.debug("Node groups fetched for cluster %s: %s", cluster_uid, nodegroups)
             
-            if not nodegroups:
-                logging.error(f"Failed to fetch node groups for cluster {cluster_uid}.")
-                continue
+            # A failed fetch leaves that part of the cluster empty; the rest of the topology is still shown
+            if not nodegroups and 'nodegroups' in include:
+                log.error("Failed to fetch node groups for cluster %s.", cluster_uid)
+                nodegroups = []
 
             for nodegroup in nodegroups:
                 if not isinstance(nodegroup, dict):
-                    logging.error(f"Expected dictionary for node group, got {type(nodegroup)}: {nodegroup}")
+                    log.error("Expected dictionary for node group, got %s: %s", type(nodegroup), nodegroup)
                     continue
 
-                logging.info(f"Processing node group {nodegroup['name']}")
+                log.info("Processing node group %s", nodegroup['name'])
                 nodegroup_data = {
                     'NodeGroup': nodegroup['name'],
                     'Nodes': nodegroup.get('nodes', []),
@@ -222,47 +420,47 @@ def fetch_mmai_topology(client):
                 }
                 cluster_data['NodeGroups'].append(nodegroup_data)
 
-            # Fetch departments using list_departments_by_cluster_uid
-            departments = list_departments_by_cluster_uid(cluster_uid, client)
-            logging.info(f"Departments fetched for cluster {cluster_uid}: {departments}")
+            log.debug("Departments fetched for cluster %s: %s", cluster_uid, departments)
             
-            if not departments:
-                logging.error(f"Failed to fetch departments for cluster {cluster_uid}.")
-                continue
+            if not departments and 'departments' in include:
+                log.error("Failed to fetch departments for cluster %s.", cluster_uid)
+                departments = []
 
-            for department in departments:
-                if not isinstance(department, dict):
-                    logging.error(f"Expected dictionary for department, got {type(department)}: {department}")
-                    continue
+            # The cluster's projects are fetched once and grouped by the department they belong to
+            log.debug("Projects fetched for cluster %s: %s", cluster_uid, projects)
 
-                logging.info(f"Processing department {department['name']}")
-                department_data = {'Department': department['name'], 'Projects': []}
+            if departments and not projects and 'projects' in include:
+                log.error("Failed to fetch projects for cluster %s.", cluster_uid)
 
-                # Fetch projects for the entire cluster and associate them with the correct department
-                projects = list_projects_by_cluster_uid(cluster_uid, client)
-                logging.info(f"Projects fetched for cluster {cluster_uid}: {projects}")
-                
-                if not projects:
-                    logging.error(f"Failed to fetch projects for cluster {cluster_uid}.")
+            projects_by_department = defaultdict(list)
+            for project in projects or []:
+                if not isinstance(project, dict):
+                    log.error("Expected dictionary for project, got %s: %s", type(project), project)
+                    continue
+                projects_by_department[project.get('department')].append(project)
+
+            for department in departments:
+                if not isinstance(department, dict):
+                    log.error("Expected dictionary for department, got %s: %s", type(department), department)
                     continue
 
-                # Filter projects based on the department they belong to
-                for project in projects:
-                    if not isinstance(project, dict):
-                        logging.error(f"Expected dictionary for project, got {type(project)}: {project}")
-                        continue
-
-                    if project['department'] == department['name']:  # Match project to department
-                        logging.info(f"Adding project {project['name']} to department {department['name']}")
-                        project_data = {
-                            'Project': project['name'],
-                            'PriorityClass': project['priorityClass'],
-                            'Reservations': project['reservations'],
-                            'UsedQuotas': project['usedQuotas'],
-                            'NumberOfAdmittedWorkloads': project['numberOfAdmittedWorkloads'],
-                            'NumberOfPendingWorkloads': project['numberOfPendingWorkloads'],
-                        }
-                        department_data['Projects'].append(project_data)
+                log.info("Processing department %s", department['name'])
+                department_data = {'Department': department['name']}
+                if 'projects' in include:
+                    department_data['Projects'] = []
+
+                for project in projects_by_department.get(department['name'], []):
+                    log.info("Adding project %s to department %s", project['name'], department['name'])
+                    # Missing optional fields are left empty rather than aborting the whole topology
+                    project_data = {
+                        'Project': project['name'],
+                        'PriorityClass': project.get('priorityClass'),
+                        'Reservations': project.get('reservations'),
+                        'UsedQuotas': project.get('usedQuotas'),
+                        'NumberOfAdmittedWorkloads': project.get('numberOfAdmittedWorkloads'),
+                        'NumberOfPendingWorkloads': project.get('numberOfPendingWorkloads'),
+                    }
+                    department_data['Projects'].append(project_data)
                 
                 cluster_data['Departments'].append(department_data)
 
@@ -272,7 +470,7 @@ def fetch_mmai_topology(client):
 
     except Exception as e:
         # Handle any other unexpected errors
-        logging.error(f"Unexpected error occurred: {e}")
+        log.error("Unexpected error occurred: %s", e)
         return {
             "error": "Unexpected error occurred.",
             "suggestion": f"An unexpected error occurred: {str(e)}. Please check your environment and try again."
@@ -286,30 +484,33 @@ def print_topology_data(topology_data):
     Args:
         topology_data (dict): A dictionary representing the MMAI topology.
     """
+    # Lines are collected and written to stdout in one call
+    out = io.StringIO()
+    write = out.write
     try:
-        print("MMAI Topology:")
+        write("MMAI Topology:\n")
         if 'Clusters' not in topology_data or not isinstance(topology_data['Clusters'], list):
-            logging.error("Invalid topology data: 'Clusters' key missing or not a list")
+            log.error("Invalid topology data: 'Clusters' key missing or not a list")
             return
 
         for cluster in topology_data['Clusters']:
             if not isinstance(cluster, dict):
-                logging.error(f"Expected dictionary for cluster, got {type(cluster)}: {cluster}")
+                log.error("Expected dictionary for cluster, got %s: %s", type(cluster), cluster)
                 continue
 
-            print(f"Clusters:")
-            print(f"│   Cluster: {cluster.get('Cluster', 'N/A')}")
+            write("Clusters:\n")
+            write(f"│   Cluster: {cluster.get('Cluster', 'N/A')}\n")
 
             # Process NodeGroups with indentation
             if 'NodeGroups' in cluster and isinstance(cluster['NodeGroups'], list):
-                print("│   │   NodeGroups:")
+                write("│   │   NodeGroups:\n")
                 for nodegroup in cluster['NodeGroups']:
                     if isinstance(nodegroup, dict):
-                        print(f"│   │   │   NodeGroup: {nodegroup.get('NodeGroup', 'N/A')}")
+                        write(f"│   │   │   NodeGroup: {nodegroup.get('NodeGroup', 'N/A')}\n")
                         if 'Nodes' in nodegroup and isinstance(nodegroup['Nodes'], list):
-                            print("│   │   │   │   Nodes:")
+                            write("│   │   │   │   Nodes:\n")
                             for node in nodegroup['Nodes']:
-                                print(f"│   │   │   │   │   {node}")
+                                write(f"│   │   │   │   │   {node}\n")
                                 
                                 # Assuming the resource information is available in the node structure
                                 # Display CPUs, Memory, and GPUs
@@ -321,45 +522,52 @@ def print_topology_data(topology_data):
                                 gpu_count = gpus.get('nvidia.com/gpu', '0')
                                 
                                 # Display node resources (CPUs, Memory, GPUs)
-                                print(f"│   │   │   │   │   │   CPUs: {cpu_count}")
-                                print(f"│   │   │   │   │   │   Memory: {memory_capacity} GiB")
-                                print(f"│   │   │   │   │   │   GPUs: {gpu_count}")
+                                write(f"│   │   │   │   │   │   CPUs: {cpu_count}\n")
+                                write(f"│   │   │   │   │   │   Memory: {memory_capacity} GiB\n")
+                                write(f"│   │   │   │   │   │   GPUs: {gpu_count}\n")
                     else:
-                        logging.error(f"Expected dictionary for nodegroup, got {type(nodegroup)}: {nodegroup}")
-            else:
-                logging.error("NodeGroups missing or invalid in cluster data")
+                        log.error("Expected dictionary for nodegroup, got %s: %s", type(nodegroup), nodegroup)
+            elif 'NodeGroups' in cluster:
+                log.error("NodeGroups invalid in cluster data")
 
             # Process Departments with indentation
             if 'Departments' in cluster and isinstance(cluster['Departments'], list):
-                print("│   │   Departments:")
+                write("│   │   Departments:\n")
                 for department in cluster['Departments']:
                     if isinstance(department, dict):
-                        print(f"│   │   │   Department: {department.get('Department', 'N/A')}")
+                        write(f"│   │   │   Department: {department.get('Department', 'N/A')}\n")
                         if 'Projects' in department and isinstance(department['Projects'], list):
-                            print("│   │   │   │   Projects:")
+                            write("│   │   │   │   Projects:\n")
                             for project in department['Projects']:
                                 if isinstance(project, dict):
-                                    print(f"│   │   │   │   │   Project: {project.get('Project', 'N/A')}")
+                                    write(f"│   │   │   │   │   Project: {project.get('Project', 'N/A')}\n")
                                 else:
-                                    logging.error(f"Expected dictionary for project, got {type(project)}: {project}")
+                                    log.error("Expected dictionary for project, got %s: %s", type(project), project)
                     else:
-                        logging.error(f"Expected dictionary for department, got {type(department)}: {department}")
-            else:
-                logging.error("Departments missing or invalid in cluster data")
+                        log.error("Expected dictionary for department, got %s: %s", type(department), department)
+            elif 'Departments' in cluster:
+                log.error("Departments invalid in cluster data")
 
     except Exception as e:
-        logging.error(f"Error fetching MMAI topology: {e}")
+        log.error("Error fetching MMAI topology: %s", e)
+    finally:
+        sys.stdout.write(out.getvalue())
 
 
 def mmai_topology(args, client):
     """Displays the MMAI hardware/software topology in a tree view format."""
     try:
         # Fetch the MMAI topology data
-        topology_data = fetch_mmai_topology(client)
+        include = set(section.strip() for section in args.include.split(',') if section.strip())
+        unknown = include.difference(MMAI_SECTIONS)
+        if unknown:
+            log.error("Unknown --include section(s): %s. Choose from: %s", ', '.join(sorted(unknown)), ', '.join(MMAI_SECTIONS))
+            return None
+        topology_data = fetch_mmai_topology(client, include=include)
 
         # Print the tree starting from the cluster
         print_topology_data(topology_data)
 
     except Exception as e:
-        logging.error(f"Error fetching MMAI topology: {str(e)}")
+        log.error("Error fetching MMAI topology: %s", e)
         return f"Error: {str(e)}"
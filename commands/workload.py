@@ -1,6 +1,7 @@
-import json
 import logging
-from utils import flatten_json, get_cluster_uid, filter_json
+from operator import itemgetter
+from api_client import EXPECTED_ERRORS
+from utils import flattened_lines, get_cluster_uid, filter_json, print_json, top_level_fields
 
 def setup_parser(subparsers):
     """Sets up the argparse subcommands for workloads."""
@@ -45,38 +46,32 @@ def list_workloads(args, client):
     try:
         cluster_uid = get_cluster_uid(client, args.cluster)
         
+        # Only workload names are shown, so only the name (and any filtered fields) is kept of each workload
+        fields = top_level_fields(args.filter.split(',') if args.filter else (), required=('name',))
+
         # If project is specified, fetch workloads for that project within the cluster
         if args.project:
-            workloads = client.get(f"clusters/{cluster_uid}/projects/{args.project}/workloads")
+            workloads = client.stream(f"clusters/{cluster_uid}/projects/{args.project}/workloads", fields=fields)
         else:
-            workloads = client.get(f"clusters/{cluster_uid}/workloads")
+            workloads = client.stream(f"clusters/{cluster_uid}/workloads", fields=fields)
 
-        # Fetch the cluster name
-        cluster_info = client.get(f"clusters/{cluster_uid}")
-        cluster_name = cluster_info['name']
+        # Every output format only needs the names, so they are extracted once as the workloads arrive
+        names = list(map(itemgetter('name'), workloads))
 
-        # Apply filter if provided
-        if args.filter:
-            filters = args.filter.split(',')
-            workloads = filter_json(workloads, filters)
+        # The cluster name comes from the cluster list already fetched to resolve the UID
+        cluster_name = client.get_cluster(cluster_uid)['name']
 
         if args.output == 'json':
             # JSON format should show only cluster name and workload names
-            simplified_output = {
-                "cluster": cluster_name,
-                "workloads": [workload['name'] for workload in workloads]
-            }
-            print(json.dumps(simplified_output, indent=4))
+            print_json({"cluster": cluster_name, "workloads": names})
         elif args.output == 'dot':
             # Dot notation format
-            output_lines = [f"cluster[{cluster_name}].workload[{i}].name: {workload['name']}" for i, workload in enumerate(workloads)]
-            print("\n".join(output_lines))
+            prefix = f"cluster[{cluster_name}].workload"
+            print("\n".join([f"{prefix}[{i}].name: {name}" for i, name in enumerate(names)]))
         else:  # Default output: text format, show workload names under each cluster
-            output_lines = [f"[{cluster_name}]"]
-            output_lines.extend([workload['name'] for workload in workloads])
-            print("\n".join(output_lines))
+            print("\n".join([f"[{cluster_name}]", *names]))
 
-    except Exception as e:
+    except EXPECTED_ERRORS as e:
         logging.error(f"Failed to fetch workloads: {e}")
         return None
 
@@ -85,42 +80,28 @@ def get_workloads(args, client):
     """Gets all workload properties in a cluster or project."""
     try:
         cluster_uid = get_cluster_uid(client, args.cluster)
+        filters = args.filter.split(',') if args.filter else None
+
+        # With a filter, only the top-level fields it names are kept of each workload as it is parsed
+        fields = top_level_fields(filters) if filters else None
         if args.project:
-            workloads = client.get(f"clusters/{cluster_uid}/projects/{args.project}/workloads")
+            workloads = list(client.stream(f"clusters/{cluster_uid}/projects/{args.project}/workloads", fields=fields))
         else:
-            workloads = client.get(f"clusters/{cluster_uid}/workloads")
+            workloads = list(client.stream(f"clusters/{cluster_uid}/workloads", fields=fields))
 
-        # Apply filter if provided
-        if args.filter:
-            filters = args.filter.split(',')
+        # Apply filter if provided; nested (dotted) fields are resolved here
+        if filters:
             workloads = filter_json(workloads, filters)
 
         if args.output == 'json':
-            print(json.dumps(workloads, indent=4))
+            print_json(workloads)
         elif args.output == 'dot':
-            flattened_workloads = []
-            for i, workload in enumerate(workloads):
-                flattened_workload = flatten_json(workload, parent_key=f'cluster[{cluster_uid}].workload[{i}]')
-                flattened_workloads.append(flattened_workload)
-            
-            output_lines = []
-            for workload in flattened_workloads:
-                for key, value in workload.items():
-                    output_lines.append(f"{key}: {value}")
-            print("\n".join(output_lines))
+            # Lines are formatted straight from each workload, without an intermediate flattened dict
+            print("\n".join(flattened_lines(workloads, f'cluster[{cluster_uid}].workload')))
         else:  # text output
-            flattened_workloads = []
-            for i, workload in enumerate(workloads):
-                flattened_workload = flatten_json(workload, parent_key=f'workload[{i}]')
-                flattened_workloads.append(flattened_workload)
-
-            output_lines = []
-            for workload in flattened_workloads:
-                for key, value in workload.items():
-                    output_lines.append(f"{key}: {value}")
-            print("\n".join(output_lines))
-
-    except Exception as e:
+            print("\n".join(flattened_lines(workloads, 'workload')))
+
+    except EXPECTED_ERRORS as e:
         logging.error(f"Failed to fetch workloads: {e}")
         return None
 
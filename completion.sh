@@ -1,6 +1,10 @@
 # Add this script to your shell configuration to enable tab completion.
 _mmaictl_completions()
 {
-    COMPREPLY=( $(compgen -W "$(mmaictl --help | grep '  [a-z]' | awk '{print $1}')" -- ${COMP_WORDS[COMP_CWORD]}) )
+    # Build the subcommand list once per shell instead of running `mmaictl --help` on every TAB
+    if [ -z "${_MMAICTL_SUBCOMMANDS}" ]; then
+        _MMAICTL_SUBCOMMANDS="$(mmaictl --help | grep '  [a-z]' | awk '{print $1}')"
+    fi
+    COMPREPLY=( $(compgen -W "${_MMAICTL_SUBCOMMANDS}" -- ${COMP_WORDS[COMP_CWORD]}) )
 }
 complete -F _mmaictl_completions mmaictl
@@ -1,19 +1,28 @@
 #!/usr/bin/env python3 
 
 import argparse
+import importlib
 import logging
 import sys
 import os
-from api_client import APIClient
 from utils import setup_logging
-from commands import cluster, department, nodegroup, project, workload, billing, topology, nodes
 
+# Subcommand name -> (module providing its setup_parser(), help shown in the subcommand list).
+# Modules are only imported when needed; the help text lets the top-level help and usage
+# errors list every subcommand without importing the modules (and the HTTP stack they pull in).
+SUBCOMMANDS = {
+    'cluster': ('commands.cluster', 'Manage clusters'),
+    'department': ('commands.department', 'Manage departments'),
+    'nodegroup': ('commands.nodegroup', 'Manage node groups'),
+    'project': ('commands.project', 'Manage projects'),
+    'workload': ('commands.workload', 'Manage workloads'),
+    # 'billing': ('commands.billing', 'Get billing details for departments'),  // Not implemented yet in the API
+    'topology': ('commands.topology', 'Display the environment topology (MMAI or Kubernetes)'),
+    'node': ('commands.nodes', 'Manage nodes in clusters'),
+}
 
-# Enable tab completion if installed
-try:
-    import argcomplete
-except ImportError:
-    pass
+# Set by argcomplete's shell hook when the shell asks for completions
+COMPLETING = '_ARGCOMPLETE' in os.environ
 
 class CustomArgumentParser(argparse.ArgumentParser):
     def error(self, message):
@@ -26,60 +35,143 @@ class CustomArgumentParser(argparse.ArgumentParser):
         # Print usage message
         self.print_usage()
         
-        # Print available commands in a more readable format
-        sys.stderr.write("\nAvailable subcommands:\n")
+        # Print available commands in a more readable format. The list comes from the registered
+        # parsers (stubs when the subcommand was not determined), so no command module is imported.
+        lines = []
         for action in self._actions:
             if isinstance(action, argparse._SubParsersAction):
-                for choice, subparser in action.choices.items():
-                    sys.stderr.write(f"  - {choice}: {subparser.description}\n")
+                # Parsers registered with only a help text (e.g. actions) fall back to it
+                help_texts = {choice.dest: choice.help for choice in action._choices_actions}
+                lines.extend(f"  - {choice}: {subparser.description or help_texts.get(choice, '')}\n"
+                             for choice, subparser in action.choices.items())
+        sys.stderr.write("\nAvailable subcommands:\n" + "".join(lines))
         sys.exit(2)
 
-def main():
-    #parser = argparse.ArgumentParser(
-    #    description="mmaictl: Command-line utility to manage platform resources like clusters, departments, and node groups."
-    #)
-    parser = CustomArgumentParser(description="mmaictl: Command-line utility to manage platform resources like clusters, departments, and node groups")
-    
-    # Global options
+class _PeekArgumentParser(argparse.ArgumentParser):
+    def error(self, message):
+        """Raise instead of exiting, so the full parser reports the problem."""
+        raise ValueError(message)
+
+def add_global_options(parser):
+    """
+    Adds the options accepted before the subcommand.
+
+    Args:
+        parser (argparse.ArgumentParser): The parser to add the options to.
+    """
     parser.add_argument('--api-url', default='http://localhost:32323/v1', help='Base URL for the API')
     parser.add_argument('--token', help='Authentication token')
+    parser.add_argument('--rate-limit', type=float, help='Maximum number of API requests per second (default: unlimited)')
+    parser.add_argument('--no-cache', action='store_true', help='Do not use cached API responses')
+    parser.add_argument('--refresh', action='store_true', help='Discard cached API responses and cache fresh ones')
     parser.add_argument('-v', '--verbose', action='count', default=0, help='Increase verbosity (can be used multiple times)')
     parser.add_argument('--quiet', action='store_true', help='Enable quiet mode (minimal output)')
+
+def find_subcommand(argv):
+    """
+    Finds the subcommand named on the command line without fully parsing it.
+    The global options are parsed the same way as by the full parser (abbreviations included),
+    so their values are never mistaken for the subcommand.
+    
+    Args:
+        argv (list): The command-line arguments, excluding the program name.
+
+    Returns:
+        str or None: The subcommand name, or None if help was requested or no known subcommand was given.
+    """
+    peek = _PeekArgumentParser(add_help=False)
+    add_global_options(peek)
+    try:
+        _, rest = peek.parse_known_args(argv)
+    except ValueError:
+        return None
+    for arg in rest:
+        if arg in ('-h', '--help'):
+            return None
+        if arg.startswith('-'):
+            continue
+        return arg if arg in SUBCOMMANDS else None
+    return None
+
+def build_parser(argv=None):
+    """
+    Builds the top-level argument parser and registers the subcommands.
+    Only the module of the subcommand named in `argv` is imported. When it cannot be determined
+    (help, or an unknown name) the subcommands are registered by name and help only, except
+    during tab completion, which needs every subcommand's arguments.
+    
+    Args:
+        argv (list): The command-line arguments, excluding the program name.
+
+    Returns:
+        CustomArgumentParser: The fully populated parser.
+    """
+    parser = CustomArgumentParser(description="mmaictl: Command-line utility to manage platform resources like clusters, departments, and node groups")
+    
+    # Global options
+    add_global_options(parser)
     
     # Create subparsers for objects
     subparsers = parser.add_subparsers(dest='object', help='Object to manage')
     subparsers.required = True  # Ensure a subcommand is required to be provided
     
     # Register command subparsers by calling their setup function
-    cluster.setup_parser(subparsers)
-    department.setup_parser(subparsers)
-    nodegroup.setup_parser(subparsers)
-    project.setup_parser(subparsers)
-    workload.setup_parser(subparsers)
-    # billing.setup_parser(subparsers) // Not implemented yet in the API
-    topology.setup_parser(subparsers)
-    nodes.setup_parser(subparsers)
-
-    # Enable tab completion if available
-    if 'argcomplete' in globals():
-        argcomplete.autocomplete(parser)
+    subcommand = find_subcommand(argv or [])
+    if subcommand:
+        importlib.import_module(SUBCOMMANDS[subcommand][0]).setup_parser(subparsers)
+    elif COMPLETING:
+        for module, _ in SUBCOMMANDS.values():
+            importlib.import_module(module).setup_parser(subparsers)
+    else:
+        for name, (_, help_text) in SUBCOMMANDS.items():
+            subparsers.add_parser(name, help=help_text, description=help_text)
+
+    return parser
+
+def main():
+    parser = build_parser(sys.argv[1:])
+
+    # Enable tab completion if available; argcomplete is only imported when completing
+    if COMPLETING:
+        try:
+            import argcomplete
+        except ImportError:
+            pass
+        else:
+            argcomplete.autocomplete(parser)
 
     args = parser.parse_args()
 
     # Setup logging based on verbose and quiet flags
-    setup_logging(args.verbose)
+    setup_logging(args.verbose, quiet=args.quiet)
 
     # Ensure a valid subcommand was provided
     if hasattr(args, 'func'):
-        client = APIClient(base_url=args.api_url, token=args.token)
+        # Imported only once a command is about to run; requests is slow to import
+        from api_client import EXPECTED_ERRORS, get_client
+        client = get_client(args.api_url, token=args.token, rate_limit=args.rate_limit, cache=not args.no_cache)
+        if args.refresh:
+            client.invalidate_clusters()
+            client.invalidate_cache()
         try:
             # result = args.func(args, client)
             # print(result)  # Output the result in a formatted way
             # Let the sub command print any output and error(s). Avoids printing "None" when the sub command returns.
             args.func(args, client)
+        except KeyboardInterrupt:
+            sys.exit(130)
+        except EXPECTED_ERRORS as e:
+            # API and input errors not reported by the handler itself; a traceback is only shown
+            # when debugging (-vv), since a KeyError here can also be a bug in the handler
+            logging.error("Error: %s", e, exc_info=args.verbose >= 2)
+            sys.exit(1)
         except Exception as e:
-            logging.error(f"Error: {str(e)}")
-            exit(1)
+            # Unexpected errors reach here; show the traceback only when debugging (-vv)
+            if args.verbose >= 2:
+                logging.exception("Error: %s", e)
+            else:
+                logging.error("Error: %s", e)
+            sys.exit(1)
     else:
         parser.print_help()
 
@@ -1,13 +1,19 @@
-from setuptools import setup, find_packages
+from setuptools import setup
 
 setup(
     name='mmaictl',
     version='1.0.0',
-    packages=find_packages(),
+    # Listed explicitly: the CLI is a set of top-level modules plus the commands package
+    py_modules=['mmaictl', 'api_client', 'utils'],
+    packages=['commands'],
     install_requires=[
         'requests',
         'argcomplete',
     ],
+    extras_require={
+        # Faster JSON decoding/encoding and incremental parsing of large responses
+        'fast': ['orjson', 'ijson'],
+    },
     entry_points={
         'console_scripts': [
             'mmaictl=mmaictl:main',
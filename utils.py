@@ -1,14 +1,69 @@
 import logging
 import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
-def setup_logging(verbosity):
+# Use the faster orjson encoder when it is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Upper bound on concurrent per-cluster API requests (keep <= api_client.POOL_MAXSIZE)
+MAX_FETCH_WORKERS = 32
+
+def find_action(argv, object_name):
     """
-    Sets up logging based on the verbosity level.
+    Finds the action that follows `object_name` on the command line.
+    
+    Args:
+        argv (list): The command-line arguments, excluding the program name.
+        object_name (str): The subcommand the action belongs to (e.g. 'nodegroup').
+
+    Returns:
+        str or None: The action name, or None if it cannot be determined or help was requested.
+    """
+    if object_name not in argv:
+        return None
+    for arg in argv[argv.index(object_name) + 1:]:
+        if arg in ('-h', '--help'):
+            return None
+        if not arg.startswith('-'):
+            return arg
+    return None
+
+def add_action_parsers(action_subparsers, object_name, actions, argv=None):
+    """
+    Registers action subparsers, building only the action named on the command line.
+    Every action is built when the action cannot be determined, so help and error messages
+    still list them all.
+    
+    Args:
+        action_subparsers: The subparsers object returned by add_subparsers() for the object.
+        object_name (str): The subcommand the actions belong to (e.g. 'nodegroup').
+        actions (dict): Action name -> (help text, function adding the action's arguments).
+        argv (list): The command-line arguments; defaults to sys.argv[1:].
+    """
+    action = find_action(sys.argv[1:] if argv is None else argv, object_name)
+    for name, (help_text, build) in actions.items():
+        if action in actions and name != action:
+            continue
+        build(action_subparsers.add_parser(name, help=help_text))
+
+def setup_logging(verbosity=0, quiet=False):
+    """
+    Sets up logging based on the verbosity level. Later calls are no-ops once logging is configured.
     Args:
         verbosity (int): The verbosity level. 0 means WARNING, 1 means INFO, 2 means DEBUG, 3 means NOTSET (all messages).
+        quiet (bool): Only log errors, whatever the verbosity.
     """
+    if logging.getLogger().handlers:
+        return
+
     # Map verbosity to logging levels
-    if verbosity == 0:
+    if quiet:
+        log_level = logging.ERROR
+    elif verbosity == 0:
         log_level = logging.WARNING
     elif verbosity == 1:
         log_level = logging.INFO
@@ -27,62 +82,292 @@ def output_formatter(data, args):
     if isinstance(data, dict):
         print(json.dumps(data, indent=4))
     elif isinstance(data, list):
-        for item in data:
-            print(json.dumps(item, indent=4))
+        # One document per item, written together rather than one print per item
+        if data:
+            sys.stdout.write("\n".join([json.dumps(item, indent=4) for item in data]))
+            sys.stdout.write("\n")
     else:
         print(data)
 
+def dumps_json(data, pretty=True):
+    """
+    Serializes data to a JSON string, using orjson when available.
+    
+    Args:
+        data: The JSON-compatible object to serialize.
+        pretty (bool): Indent the document; otherwise emit compact JSON without whitespace.
+
+    Returns:
+        str: The JSON document.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0).decode()
+    if pretty:
+        return json.dumps(data, indent=2)
+    return json.dumps(data, separators=(',', ':'))
+
+def pretty_json(args):
+    """
+    Returns True if JSON output should be indented: when --pretty is given or stdout is a terminal.
+    Output piped to other tools is compact by default.
+    """
+    return getattr(args, 'pretty', False) or sys.stdout.isatty()
+
+def print_json(data, pretty=True):
+    """
+    Writes data to stdout as JSON.
+    With orjson the encoded bytes go straight to the binary buffer, skipping the str round-trip.
+    A top-level list is encoded one element at a time, so the serialized form of a large list
+    is never held in memory at once; the output is the same as encoding it in one go.
+    
+    Args:
+        data: The JSON-compatible object to write.
+        pretty (bool): Indent the document; otherwise emit compact JSON.
+    """
+    if orjson is not None and hasattr(sys.stdout, 'buffer'):
+        # Flush pending text first so output stays in order
+        sys.stdout.flush()
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        _write_json(sys.stdout.buffer.write, lambda obj: orjson.dumps(obj, option=option), data, pretty, str.encode)
+        return
+    _write_json(sys.stdout.write, lambda obj: dumps_json(obj, pretty=pretty), data, pretty, str)
+
+def _write_json(write, encode, data, pretty, literal):
+    """
+    Writes `data` followed by a newline, encoding the elements of a non-empty list one by one.
+    `literal` converts the punctuation written between elements to the type `encode` returns.
+    """
+    if not isinstance(data, list) or not data:
+        write(encode(data))
+        write(literal("\n"))
+        return
+
+    if pretty:
+        # Elements sit one level (two spaces) into the list, so each of their lines is indented
+        start, sep, end = literal("[\n  "), literal(",\n  "), literal("\n]\n")
+        newline, indented = literal("\n"), literal("\n  ")
+    else:
+        start, sep, end = literal("["), literal(","), literal("]\n")
+
+    write(start)
+    for i, item in enumerate(data):
+        if i:
+            write(sep)
+        chunk = encode(item)
+        write(chunk.replace(newline, indented) if pretty else chunk)
+    write(end)
+
 def flatten_json(nested_json, parent_key='', sep='.'):
     """
     Flattens a nested JSON object into a single-level dictionary with dot notation.
+    Nested objects are walked with an explicit stack, so deep documents cost no recursion.
     
     Args:
         nested_json (dict): The nested JSON object to flatten.
-        parent_key (str): The base key to prepend (used in recursion).
+        parent_key (str): The base key to prepend to every key.
         sep (str): The separator between parent and child keys.
 
     Returns:
         dict: A flattened dictionary with dot notation for nested keys.
     """
-    items = []
-    for key, value in nested_json.items():
-        new_key = f"{parent_key}{sep}{key}" if parent_key else key
-        if isinstance(value, dict):
-            items.extend(flatten_json(value, new_key, sep=sep).items())
+    flat = {}
+    _flatten_into(flat, nested_json, f"{parent_key}{sep}" if parent_key else '', sep)
+    return flat
+
+def flatten_many(items, prefix, sep='.'):
+    """
+    Flattens each JSON object in a list, indexing the keys of each item as `prefix[i]`.
+    
+    Args:
+        items (iterable): The JSON objects to flatten.
+        prefix (str): The key prefix, e.g. "cluster[c1].node".
+        sep (str): The separator between parent and child keys.
+
+    Returns:
+        list: One flattened dictionary per item.
+    """
+    # Built once; only the index is formatted per item
+    head_fmt = f"{prefix}[{{}}]{sep}".format
+    flattened = []
+    for i, item in enumerate(items):
+        flat = {}
+        _flatten_into(flat, item, head_fmt(i), sep)
+        flattened.append(flat)
+    return flattened
+
+def _flatten_into(flat, nested_json, head, sep):
+    """
+    Adds the leaves of nested_json to flat, keeping the document's key order.
+    `head` is the already-joined key prefix including its trailing separator ('' for none).
+    """
+    # Most API objects are already flat: prefix the keys without walking them
+    if not any(type(value) is dict for value in nested_json.values()):
+        if head:
+            flat.update((f"{head}{key}", value) for key, value in nested_json.items())
         else:
-            items.append((new_key, value))
-    return dict(items)
+            flat.update(nested_json)
+        return
+
+    stack = [(head, iter(nested_json.items()))]
+    while stack:
+        head, entries = stack[-1]
+        for key, value in entries:
+            new_key = f"{head}{key}"
+            if type(value) is dict:
+                # Descend now; the parent's iterator resumes once this child is done
+                stack.append((f"{new_key}{sep}", iter(value.items())))
+                break
+            flat[new_key] = value
+        else:
+            stack.pop()
+
+def iter_flat_lines(nested_json, parent_key='', sep='.'):
+    """
+    Yields "key: value" lines for a nested JSON object using the same dot notation as flatten_json,
+    without building the intermediate flattened dictionary.
+    
+    Args:
+        nested_json (dict): The nested JSON object to flatten.
+        parent_key (str): The base key to prepend to every key.
+        sep (str): The separator between parent and child keys.
+
+    Yields:
+        str: One formatted line per leaf value.
+    """
+    stack = [(f"{parent_key}{sep}" if parent_key else '', iter(nested_json.items()))]
+    while stack:
+        head, entries = stack[-1]
+        for key, value in entries:
+            if type(value) is dict:
+                stack.append((f"{head}{key}{sep}", iter(value.items())))
+                break
+            yield f"{head}{key}: {value}"
+        else:
+            stack.pop()
+
+def flattened_lines(items, prefix):
+    """
+    Yields "key: value" lines for each item flattened into dot notation.
+    
+    Args:
+        items (iterable): The JSON objects to flatten.
+        prefix (str): The key prefix; each item is indexed as `prefix[i]`.
+
+    Yields:
+        str: One formatted line per leaf value.
+    """
+    for i, item in enumerate(items):
+        yield from iter_flat_lines(item, f"{prefix}[{i}]")
 
 def get_cluster_uid(client, cluster_identifier=None):
     """
     Fetches the cluster UID based on either the cluster name or UID.
+    The cluster list and its name/UID index are cached on the client, so repeated lookups cost a single API call.
     
     Args:
         client: APIClient instance to communicate with the API.
         cluster_identifier: The name or UID of the cluster. If None, it will auto-select the cluster if only one exists.
 
     Returns:
-        The UID of the cluster or raises an error if not found.
+        The UID of the cluster or raises ValueError if not found.
     """
-    clusters = client.get("clusters")
+    clusters = client.get_clusters()
 
     if not clusters:
-        raise Exception("No clusters found.")
+        raise ValueError("No clusters found.")
     
     if cluster_identifier:
-        # Try to find the cluster by name or UID
+        # Look the cluster up by name or UID
+        cluster = client.get_cluster(cluster_identifier)
+        if cluster is not None:
+            return cluster['uid']
+    elif len(clusters) == 1:
+        # If only one cluster exists, use it
+        return clusters[0]['uid']
+
+    # The cluster could not be determined; list the options either way
+    available_clusters = ', '.join(cluster['name'] for cluster in clusters)
+    if cluster_identifier:
+        raise ValueError(f"Cluster '{cluster_identifier}' not found. Available clusters: {available_clusters}")
+    raise ValueError(f"Multiple clusters found. Specify a cluster with --cluster. Available clusters: {available_clusters}")
+
+def resolve_clusters(args, client):
+    """
+    Resolves the clusters a command operates on: the one named by --cluster, or all clusters.
+    
+    Args:
+        args: The parsed arguments; `args.cluster` is a cluster name or UID, or None.
+        client: APIClient instance to communicate with the API.
+
+    Returns:
+        list: Dicts with the 'name' and 'uid' of each cluster, or None if there are no clusters.
+    """
+    if args.cluster:
+        return [{"name": args.cluster, "uid": get_cluster_uid(client, args.cluster)}]
+
+    clusters = client.get_clusters()
+    if not clusters or not isinstance(clusters, list):
+        logging.error("No clusters found.")
+        return None
+    return clusters
+
+def iter_per_cluster(clusters, fetch):
+    """
+    Calls `fetch` for every cluster concurrently and yields each cluster with its result,
+    in the order of `clusters`, as soon as that result is ready.
+    Callers can render one cluster while the following ones are still being fetched.
+    
+    Args:
+        clusters (list): A list of cluster dictionaries containing at least a 'uid' key.
+        fetch (callable): A function taking a cluster UID and returning the fetched data.
+
+    Yields:
+        tuple: (cluster, result) pairs in the same order as `clusters`.
+    """
+    if len(clusters) <= 1:
         for cluster in clusters:
-            if cluster['name'] == cluster_identifier or cluster['uid'] == cluster_identifier:
-                return cluster['uid']
-        raise Exception(f"Cluster '{cluster_identifier}' not found.")
+            yield cluster, fetch(cluster.get('uid'))
+        return
+
+    with ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(clusters))) as executor:
+        results = executor.map(lambda cluster: fetch(cluster.get('uid')), clusters)
+        yield from zip(clusters, results)
+
+def fetch_per_cluster(clusters, fetch):
+    """
+    Calls `fetch` for every cluster concurrently and pairs each cluster with its result.
     
-    # If only one cluster exists, use it
-    if len(clusters) == 1:
-        return clusters[0]['uid']
+    Args:
+        clusters (list): A list of cluster dictionaries containing at least a 'uid' key.
+        fetch (callable): A function taking a cluster UID and returning the fetched data.
 
-    # If multiple clusters exist and no cluster is specified, print the options
-    available_clusters = [cluster['name'] for cluster in clusters]
-    raise Exception(f"Multiple clusters found. Specify a cluster with --cluster. Available clusters: {', '.join(available_clusters)}")
+    Returns:
+        list: A list of (cluster, result) tuples in the same order as `clusters`.
+    """
+    return list(iter_per_cluster(clusters, fetch))
+
+def projection_params(filters, required=()):
+    """
+    Builds the `fields` query parameter asking the API to return only the fields a filter needs.
+    Only top-level keys are requested, so dotted filters still find their nested values; servers
+    that ignore the parameter return whole objects and filter_json() trims them client-side.
+    
+    Args:
+        filters (list): The fields passed to --filter, in dot notation.
+        required (iterable): Extra top-level fields the command itself reads (e.g. 'name').
+
+    Returns:
+        dict: The query parameters, or None when no filter is given.
+    """
+    if not filters:
+        return None
+    return {'fields': ','.join(top_level_fields(filters, required))}
+
+def top_level_fields(filters, required=()):
+    """Returns the distinct top-level keys named by dotted `filters`, followed by those in `required`."""
+    fields = dict.fromkeys(field.split('.', 1)[0] for field in filters)
+    fields.update(dict.fromkeys(required))
+    return list(fields)
 
 def filter_json(data, filters):
     """
@@ -93,20 +378,26 @@ def filter_json(data, filters):
         filters (list): A list of fields to extract, specified in dot notation (e.g., ['name', 'description']).
     
     Returns:
-        A filtered version of the data.
+        A filtered version of the data, or the data itself when no filters are given.
     """
-    def extract_field(obj, field):
-        """Extracts a field from a nested dictionary using dot notation."""
-        keys = field.split('.')
+    # Nothing to select: the data is shown as is
+    if not filters:
+        return data
+
+    # Split each dotted field once, not once per item
+    paths = [(field, tuple(field.split('.'))) for field in filters]
+
+    def extract_field(obj, keys):
+        """Extracts a field from a nested dictionary by its key path."""
         for key in keys:
-            if isinstance(obj, dict) and key in obj:
-                obj = obj[key]
-            else:
-                return None  # Return None if the key doesn't exist
+            # A single lookup per key; a missing key (or a non-dict parent) yields None
+            if type(obj) is not dict:
+                return None
+            obj = obj.get(key)
         return obj
 
     if isinstance(data, list):
-        return [{field: extract_field(item, field) for field in filters} for item in data]
+        return [{field: extract_field(item, keys) for field, keys in paths} for item in data]
     elif isinstance(data, dict):
-        return {field: extract_field(data, field) for field in filters}
+        return {field: extract_field(data, keys) for field, keys in paths}
     return data